@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Decode many 7-segment captures at once across a process pool.
+
+Every input may be a capture (digital.csv, *.sal, *.sal.zip, or an extracted
+capture directory holding meta.json), a directory to scan for captures, or a
+glob.  Each worker imports pandas/NumPy once and then decodes file after file;
+results are appended to a JSONL file as soon as each capture finishes.  A
+directory scan only picks up CSVs that start with the Saleae export header, so
+other CSVs next to the captures are neither decoded nor logged as failures.
+
+The JSONL doubles as the cache: a capture whose content SHA-256 already has a
+successful record there, decoded with the same options, is skipped.  Workers
+hash in parallel, so unchanged files cost one read and no decode.
+
+Usage:
+    python batch.py CAPTURE_OR_DIR_OR_GLOB ... [--out decoded.jsonl] [--jobs N] [--gap auto] [--glitch 0] [--auto-perm]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+CAPTURE_SUFFIXES = ('.csv', '.sal', '.zip')
+CSV_HEADER = 'Time [s],'  # first column of a Saleae Logic CSV export
+_known_hashes: set[str] = set()
+
+
+def content_hash(path: Path) -> str:
+    """SHA-256 of a capture file, or of every member (name + bytes) of a capture directory."""
+    h = hashlib.sha256()
+    files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+    for p in files:
+        if path.is_dir():
+            h.update(p.name.encode() + b'\0')
+        with open(p, 'rb') as f:
+            while block := f.read(1 << 20):
+                h.update(block)
+    return h.hexdigest()
+
+
+def is_capture_file(path: Path) -> bool:
+    """A capture file by suffix; a CSV additionally needs the Saleae export header."""
+    if path.suffix not in CAPTURE_SUFFIXES:
+        return False
+    if path.suffix != '.csv':
+        return True
+    try:
+        with open(path, encoding='utf-8-sig', errors='replace') as f:
+            return f.readline().startswith(CSV_HEADER)
+    except OSError:
+        return False
+
+
+def find_captures(inputs: list[str]) -> list[Path]:
+    """Expand files, capture directories, directories to scan and globs into capture paths."""
+    found = []
+    for item in inputs:
+        for p in map(Path, sorted(glob.glob(item, recursive=True)) or [item]):
+            if p.is_dir() and not (p / 'meta.json').exists():
+                found += [q for q in sorted(p.rglob('*'))
+                          if (q.is_file() and is_capture_file(q)) or (q.is_dir() and (q / 'meta.json').exists())]
+            elif p.exists():
+                found.append(p)
+    return list(dict.fromkeys(found))
+
+
+def _cache_key(sha256: str, options: dict) -> str:
+    return sha256 + json.dumps(options, sort_keys=True)
+
+
+def load_cache(out_path: Path) -> set[str]:
+    """Cache keys (content hash + options) that already have a successful record in the results JSONL."""
+    if not out_path.exists():
+        return set()
+    hashes = set()
+    with open(out_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'error' not in rec and rec.get('sha256'):
+                hashes.add(_cache_key(rec['sha256'], rec.get('options', {})))
+    return hashes
+
+
+def _init_worker(known: set[str]):
+    global _known_hashes
+    _known_hashes = known
+
+
+def decode_one(path: Path, options: dict) -> dict:
+    """Worker: hash the capture, skip it if cached, otherwise decode it with try_decode(**options) -> result record."""
+    from segment import try_decode
+
+    rec = {'path': str(path), 'options': options}
+    try:
+        rec['sha256'] = content_hash(path)
+        if _cache_key(rec['sha256'], options) in _known_hashes:
+            rec['cached'] = True
+            return rec
+        t0 = time.perf_counter()
+        res = try_decode(path, options['gap'], tuple(options['perm']), **{k: options[k] for k in ('auto_perm', 'glitch')})
+        rec['seconds'] = round(time.perf_counter() - t0, 6)
+        rec.update(res)
+    except Exception as e:
+        rec['error'] = f'{type(e).__name__}: {e}'
+    return rec
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('inputs', nargs='+', help='Captures, directories to scan, or globs')
+    p.add_argument('--out', default='decoded.jsonl', help='Results JSONL (appended; also the cache); default=decoded.jsonl')
+    p.add_argument('--jobs', type=int, default=os.cpu_count(), help='Worker processes; default=CPU count')
+    p.add_argument('--gap', default='auto', help='Gap (seconds) separating bursts, or "auto"; default=auto')
+    p.add_argument('--perm', default='0,1,2,3,4,5,6', help='Permutation mapping Channel 0..6 -> segments a..g')
+    p.add_argument('--auto-perm', action='store_true', help='Search all permutations and polarities per capture')
+    p.add_argument('--glitch', type=float, default=0.0, help='Drop states lasting less than this many seconds; default=0')
+    args = p.parse_args()
+
+    perm = tuple(int(x) for x in args.perm.split(','))
+    assert len(perm) == 7 and sorted(perm) == list(range(7)), 'perm must be a permutation of 0..6'
+    options = {'gap': None if args.gap == 'auto' else float(args.gap), 'perm': list(perm),
+               'auto_perm': args.auto_perm, 'glitch': args.glitch}
+
+    captures = find_captures(args.inputs)
+    out_path = Path(args.out)
+    known = load_cache(out_path)
+    print(f'[*] {len(captures)} capture(s), {len(known)} cached result(s), {args.jobs} worker(s)', file=sys.stderr)
+
+    decoded = cached = failed = 0
+    with open(out_path, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(known,)) as pool:
+        futures = [pool.submit(decode_one, c, options) for c in captures]
+        for fut in as_completed(futures):
+            rec = fut.result()
+            if rec.get('cached'):
+                cached += 1
+                print(f"[=] {rec['path']}: cached", file=sys.stderr)
+                continue
+            out.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            out.flush()
+            if 'error' in rec:
+                failed += 1
+                print(f"[!] {rec['path']}: {rec['error']}", file=sys.stderr)
+            else:
+                decoded += 1
+                print(f"[+] {rec['path']}: {rec['ascii_from_hex']!r} {rec['flag_candidates']}", file=sys.stderr)
+    print(f'[*] decoded {decoded}, cached {cached}, failed {failed} -> {out_path}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark the 7-segment decoders on synthetic captures (see synth.py).
+
+For every capture size each decoder runs in a fresh subprocess, so peak RSS is
+its own, and reports throughput (channel transitions decoded per second, import
+time excluded), peak RSS and accuracy (share of payload nibbles recovered in
+place).
+
+Decoders:
+    segment         segment.try_decode on the CSV export
+    segment-sal     segment.try_decode on the native capture.sal/
+    segment-stream  segment --stream pipeline on the CSV export
+    ex              ex.py last-state decoder on the CSV export
+
+Usage:
+    python bench.py [--sizes 1e3,1e4,1e5,1e6] [--decoders segment,ex] [--bounce 0] [--glitch-rate 0] [--glitch 0] [--warm] [--out bench.jsonl]
+"""
+
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+DECODERS = ['segment', 'segment-sal', 'segment-stream', 'ex']
+IDENTITY = (0, 1, 2, 3, 4, 5, 6)
+
+
+def run_decoder(name: str, capture_dir: Path, glitch: float = 0.0) -> str:
+    """Decode the capture in capture_dir with one decoder -> hex string (glitch: segment.py --glitch)."""
+    csv_path = capture_dir / 'digital.csv'
+    if name == 'segment':
+        import segment
+        return segment.try_decode(csv_path, None, IDENTITY, glitch=glitch)['hex_str']
+    if name == 'segment-sal':
+        import segment
+        return segment.try_decode(capture_dir / 'capture.sal', None, IDENTITY, glitch=glitch)['hex_str']
+    if name == 'segment-stream':
+        import segment
+        from itertools import chain
+        blocks = segment.iter_debounced(segment.iter_capture(csv_path), glitch)
+        first = next(blocks)
+        gap, _ = segment.estimate_gap(first[0])
+        text = ''.join(segment.iter_glyphs(chain([first], blocks), gap, IDENTITY))
+        return segment.clean_hex(text)
+    if name == 'ex':
+        import ex
+        return ex.compact_hex(ex.decode_masks(ex.last_state_masks(csv_path)))
+    raise ValueError(f'unknown decoder {name!r}')
+
+
+def _child(name: str, capture_dir: Path, glitch: float):
+    # Import up front so the timing covers decoding only
+    import ex, segment, pandas  # noqa: F401
+    t0 = time.perf_counter()
+    hex_str = run_decoder(name, capture_dir, glitch)
+    seconds = time.perf_counter() - t0
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'seconds': seconds, 'max_rss_mb': max_rss_mb, 'hex': hex_str}))
+
+
+def accuracy(expected: str, got: str) -> float:
+    """Share of expected nibbles matched position by position, allowing one leading nibble of skew."""
+    exp = np.frombuffer(expected.lower().encode(), dtype=np.uint8)
+    out = np.frombuffer(got.lower().encode(), dtype=np.uint8)
+    if not len(exp):
+        return 1.0
+    best = 0
+    for a, b in ((exp, out), (exp[1:], out), (exp, out[1:])):
+        n = min(len(a), len(b))
+        best = max(best, int((a[:n] == b[:n]).sum()))
+    return best / len(exp)
+
+
+def bench_size(size: int, decoders: list[str], workdir: Path, glitch: float = 0.0, warm: bool = False,
+               **synth_opts) -> list[dict]:
+    from synth import random_payload, synthesize
+
+    # Roughly 4.5 transitions per digit (3.5 segment edges + strobe), two digits per byte
+    per_byte = 9 * (2 * synth_opts.get('bounce', 0) + 1)
+    payload = random_payload(max(8, size // per_byte))
+    stats = synthesize(payload, workdir, **synth_opts)
+
+    results = []
+    for name in decoders:
+        # Every decoder starts from unparsed captures; with warm, from the columnar cache
+        for cache in workdir.glob('*.cache'):
+            shutil.rmtree(cache)
+        cmd = [sys.executable, __file__, '--run', name, str(workdir), '--glitch', str(glitch)]
+        if warm:
+            subprocess.run(cmd, cwd=HERE, capture_output=True)
+        proc = subprocess.run(cmd, cwd=HERE, capture_output=True, text=True)
+        if proc.returncode:
+            results.append({'size': size, 'decoder': name, 'error': proc.stderr.strip().splitlines()[-1]})
+            continue
+        r = json.loads(proc.stdout)
+        results.append({
+            'size': size,
+            'decoder': name,
+            'transitions': stats['transitions'],
+            'seconds': r['seconds'],
+            'transitions_per_s': stats['transitions'] / max(r['seconds'], 1e-9),
+            'max_rss_mb': r['max_rss_mb'],
+            'accuracy': accuracy(stats['hex'], r['hex']),
+        })
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--sizes', default='1e3,1e4,1e5,1e6', help='Target transition counts (comma‑sep); up to 1e8')
+    p.add_argument('--decoders', default=','.join(DECODERS), help=f'Subset of {",".join(DECODERS)}')
+    p.add_argument('--rate', type=float, default=2e6, help='Sample rate of the synthetic captures')
+    p.add_argument('--bounce', type=int, default=0, help='Extra toggle pairs per edge')
+    p.add_argument('--glitch-rate', type=float, default=0.0, help='Chance per digit and channel of a glitch')
+    p.add_argument('--glitch', type=float, default=0.0, help='Glitch filter (seconds) for the segment decoders')
+    p.add_argument('--warm', action='store_true', help='Time decodes from the columnar cache (colcache.py), not the first parse')
+    p.add_argument('--out', help='Append results as JSON lines to this file')
+    p.add_argument('--run', nargs=2, metavar=('DECODER', 'DIR'), help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.run:
+        _child(args.run[0], Path(args.run[1]), args.glitch)
+        return
+
+    decoders = args.decoders.split(',')
+    print(f"{'size':>10} {'decoder':<15} {'transitions':>12} {'seconds':>9} {'trans/s':>12} {'RSS MB':>8} {'acc':>6}")
+    for size in (int(float(s)) for s in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            results = bench_size(size, decoders, Path(tmp), glitch=args.glitch, warm=args.warm, rate=args.rate,
+                                 bounce=args.bounce, glitch_rate=args.glitch_rate)
+        for r in results:
+            if 'error' in r:
+                print(f"{r['size']:>10} {r['decoder']:<15} error: {r['error']}")
+            else:
+                print(f"{r['size']:>10} {r['decoder']:<15} {r['transitions']:>12} {r['seconds']:>9.3f} "
+                      f"{r['transitions_per_s']:>12.3g} {r['max_rss_mb']:>8.1f} {r['accuracy']:>6.3f}")
+            if args.out:
+                with open(args.out, 'a') as f:
+                    f.write(json.dumps(r) + '\n')
+
+
+if __name__ == '__main__':
+    main()
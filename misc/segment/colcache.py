@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Columnar cache of a parsed logic capture, so only the first run pays for
+parsing the CSV export (or the .sal transition streams).
+
+The cache lives next to the capture, in CAPTURE.cache/:
+
+    cache.json   version, row and channel counts, size/mtime of the source
+    times.f64    float64 timestamps [s], one per row
+    states.u8    the channels of each row bit-packed into one uint8
+                 (bit i = Channel i), so at most 8 channels
+
+Both columns are opened with np.memmap, so decoders, permutation searches and
+gap sweeps read them zero-copy.  A cache whose recorded source size or mtime
+no longer matches is rebuilt on the next open.  The cache is written while the
+source is parsed block by block, and cache.json goes last, so an interrupted
+parse never leaves a cache that looks valid.
+
+Usage:
+    python colcache.py [digital.csv | capture.sal.zip | capture.sal/]   # build/refresh, print stats
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from saleae import iter_sal
+
+CACHE_SUFFIX = '.cache'
+CACHE_VERSION = 1
+CHUNK_ROWS = 1 << 20  # rows per block when parsing the source or streaming the cache
+
+
+def cache_dir(path: Path) -> Path:
+    return path.with_name(path.name + CACHE_SUFFIX)
+
+
+def source_stamp(path: Path) -> dict:
+    """Size and mtime of a capture file, or of all files of a capture directory (total size, latest mtime)."""
+    files = [p for p in path.iterdir() if p.is_file()] if path.is_dir() else [path]
+    stats = [p.stat() for p in files]
+    return {'size': sum(s.st_size for s in stats), 'mtime_ns': max((s.st_mtime_ns for s in stats), default=0)}
+
+
+def pack_states(states: np.ndarray) -> np.ndarray:
+    """uint8[rows, channels <= 8] of 0/1 -> uint8[rows], bit i = Channel i."""
+    if states.shape[1] > 8:
+        raise ValueError(f'{states.shape[1]} channels do not fit the one-byte state column')
+    return np.packbits(states, axis=1, bitorder='little').reshape(len(states))
+
+
+def unpack_states(codes: np.ndarray, channels: int) -> np.ndarray:
+    """Inverse of pack_states -> uint8[rows, channels]."""
+    return np.unpackbits(np.asarray(codes)[:, None], axis=1, count=channels, bitorder='little')
+
+
+def is_sal(path: Path) -> bool:
+    return path.is_dir() or path.suffix in ('.sal', '.zip')
+
+
+def iter_source(path: Path, chunk_rows: int = CHUNK_ROWS):
+    """Parse the capture itself (no cache) -> (times, states[rows, channels]) blocks."""
+    if is_sal(path):
+        yield from iter_sal(path)
+        return
+    import pandas as pd
+    with pd.read_csv(path, chunksize=chunk_rows) as reader:
+        for df in reader:
+            channels = [c for c in df.columns if c.startswith('Channel ')]
+            yield df['Time [s]'].to_numpy(dtype=np.float64), df[channels].to_numpy(dtype=np.uint8)
+
+
+def open_cache(path: Path):
+    """Memory-map a fresh cache of `path` -> (times, codes, channels), or None if missing or stale."""
+    d = cache_dir(path)
+    try:
+        meta = json.loads((d / 'cache.json').read_text())
+        if meta.get('version') != CACHE_VERSION or meta.get('source') != source_stamp(path):
+            return None
+        rows = meta['rows']
+        if not rows:
+            return np.zeros(0), np.zeros(0, dtype=np.uint8), meta['channels']
+        return (np.memmap(d / 'times.f64', dtype=np.float64, mode='r', shape=(rows,)),
+                np.memmap(d / 'states.u8', dtype=np.uint8, mode='r', shape=(rows,)),
+                meta['channels'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_through(path: Path, chunk_rows: int):
+    """Yield the source's blocks while appending them to a new cache, which becomes valid once exhausted."""
+    d = cache_dir(path)
+    stamp = source_stamp(path)   # taken first: a source changed mid-parse leaves a stale cache
+    try:
+        d.mkdir(exist_ok=True)
+        (d / 'cache.json').unlink(missing_ok=True)
+        times_f, states_f = open(d / 'times.f64', 'wb'), open(d / 'states.u8', 'wb')
+    except OSError:
+        # Read-only location: decode without caching
+        yield from iter_source(path, chunk_rows)
+        return
+
+    rows, channels = 0, 0
+    with times_f, states_f:
+        for times, states in iter_source(path, chunk_rows):
+            np.asarray(times, dtype=np.float64).tofile(times_f)
+            pack_states(states).tofile(states_f)
+            rows += len(times)
+            channels = states.shape[1]
+            yield times, states
+    meta = {'version': CACHE_VERSION, 'source': stamp, 'rows': rows, 'channels': channels}
+    (d / 'cache.json').write_text(json.dumps(meta))
+
+
+def open_capture(path: Path, chunk_rows: int = CHUNK_ROWS):
+    """
+    Whole capture as (times, codes, channels): memory-mapped from the cache,
+    which is built first (one streaming parse) if missing or stale.
+    """
+    path = Path(path)
+    cached = open_cache(path)
+    if cached is None:
+        for _ in _write_through(path, chunk_rows):
+            pass
+        cached = open_cache(path)
+    if cached is None:
+        # Could not write the cache; parse into memory instead
+        blocks = list(iter_source(path, chunk_rows))
+        channels = blocks[0][1].shape[1] if blocks else 0
+        return (np.concatenate([t for t, _ in blocks]) if blocks else np.zeros(0),
+                np.concatenate([pack_states(s) for _, s in blocks]) if blocks else np.zeros(0, dtype=np.uint8),
+                channels)
+    return cached
+
+
+def iter_capture(path: Path, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yield (times, states[rows, channels]) blocks of a capture: slices of the
+    cache if it is fresh, otherwise the source as it is parsed (and cached).
+    """
+    path = Path(path)
+    cached = open_cache(path)
+    if cached is None:
+        yield from _write_through(path, chunk_rows)
+        return
+    times, codes, channels = cached
+    for i in range(0, len(times), chunk_rows):
+        yield times[i:i+chunk_rows], unpack_states(codes[i:i+chunk_rows], channels)
+
+
+def main():
+    path = Path(sys.argv[1] if len(sys.argv) > 1 else 'digital.csv')
+    fresh = open_cache(path) is not None
+    times, codes, channels = open_capture(path)
+    print(f"[*] {cache_dir(path)} ({'fresh' if fresh else 'rebuilt'}): {len(times)} rows, {channels} channels")
+
+
+if __name__ == '__main__':
+    main()
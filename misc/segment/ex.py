@@ -1,48 +1,63 @@
-import sys, csv, math
-
-HEX_7SEG = {
-    0: 0b0111111,
-    1: 0b0000110,
-    2: 0b1011011,
-    3: 0b1001111,
-    4: 0b1100110,
-    5: 0b1101101,
-    6: 0b1111101,
-    7: 0b0000111,
-    8: 0b1111111,
-    9: 0b1101111,
-    10: 0b1110111,  
-    11: 0b1111100, 
-    12: 0b0111001,  
-    13: 0b1011110,
-    14: 0b1111001,
-    15: 0b1110001,
-}
-VALID_MASKS = set(HEX_7SEG.values())
-
-def read_csv_last_states(path, gap_threshold=0.5):
-    with open(path, newline='') as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-    for r in rows:
-        r["time"] = float(r["Time [s]"])
-        for i in range(8):
-            r[f"Channel {i}"] = int(r[f"Channel {i}"])
-    bursts = []
-    cur = []
-    prev_t = None
-    for r in rows:
-        t = r["time"]
-        if prev_t is not None and (t - prev_t) > gap_threshold:
-            if cur:
-                bursts.append(cur)
-                cur = []
-        cur.append(r)
-        prev_t = t
-    if cur:
-        bursts.append(cur)
-    last_states = [b[-1] for b in bursts]
-    return last_states
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from colcache import open_capture
+from gaps import gap_histogram, threshold_from_histogram
+from glyphs import HEX_MASKS, NIBBLE_LUT, hex_from_nibbles, nibbles_from_hex, score_alignments
+
+HEX_7SEG = {i: int(m) for i, m in enumerate(HEX_MASKS)}
+HEX_UPPER = np.frombuffer(b'0123456789ABCDEF.', dtype=np.uint8)  # '.' for invalid digits
+
+def estimate_gap_threshold(path, batch=1 << 16):
+    """
+    One pass over the memory-mapped timestamps (see colcache.py) -> (gap
+    threshold, confidence), from the log-gap histogram (see gaps.py).
+    """
+    times, _, _ = open_capture(Path(path))
+    hist = gap_histogram(np.zeros(0))
+    for i in range(0, len(times), batch):
+        gap_histogram(times[max(0, i - 1):i + batch], hist)
+    return threshold_from_histogram(hist)
+
+def _burst_ends(times, gap_threshold, batch):
+    """Yield arrays of row indices ending a burst, one batch of rows at a time."""
+    for i in range(0, len(times), batch):
+        # One row of lookahead, so a burst ending at the batch edge is closed here
+        yield i + np.flatnonzero(np.diff(times[i:i + batch + 1]) > gap_threshold)
+    if len(times):
+        yield np.array([len(times) - 1])
+
+def iter_last_states(path, gap_threshold=None, batch=1 << 16):
+    """
+    Walk the memory-mapped capture (see colcache.py) and yield the last state
+    of each burst, one batch of rows at a time.  With gap_threshold=None the
+    gap is estimated first (see estimate_gap_threshold).
+    """
+    if gap_threshold is None:
+        gap_threshold, _ = estimate_gap_threshold(path)
+    times, codes, channels = open_capture(Path(path))
+    for ends in _burst_ends(times, gap_threshold, batch):
+        for k in ends:
+            yield _state(times[k], codes[k], channels)
+
+def last_state_masks(path, gap_threshold=None, batch=1 << 16):
+    """Array form of iter_last_states: the segment mask (active-low) of each burst's last state."""
+    if gap_threshold is None:
+        gap_threshold, _ = estimate_gap_threshold(path)
+    times, codes, _ = open_capture(Path(path))
+    ends = np.concatenate([np.zeros(0, dtype=np.int64), *_burst_ends(times, gap_threshold, batch)])
+    return ~np.asarray(codes[ends]) & 0x7f
+
+def _state(t, code, channels):
+    st = {"time": float(t)}
+    for i in range(channels):
+        st[f"Channel {i}"] = (int(code) >> i) & 1
+    return st
+
+def read_csv_last_states(path, gap_threshold=None):
+    return list(iter_last_states(path, gap_threshold))
 
 def seven_seg_mask_from_state(state, active_low=True):
     bits = [state[f"Channel {i}"] for i in range(7)]
@@ -53,67 +68,43 @@ def seven_seg_mask_from_state(state, active_low=True):
         mask |= (b & 1) << i
     return mask
 
+def decode_masks(masks):
+    """Segment masks -> nibble array (-1 where a mask is not a hex digit)."""
+    return NIBBLE_LUT[np.asarray(masks, dtype=np.uint8)]
+
 def decode_digits(last_states):
     digits = []
     for st in last_states:
-        m = seven_seg_mask_from_state(st, active_low=True)
-        if m in VALID_MASKS:
-            val = next(k for k,v in HEX_7SEG.items() if v == m)
-            digits.append(val)
-        else:
-            digits.append(None)
+        d = int(NIBBLE_LUT[seven_seg_mask_from_state(st, active_low=True)])
+        digits.append(d if d >= 0 else None)
     return digits
 
+def _nibbles(digits):
+    if isinstance(digits, np.ndarray):
+        return digits
+    return np.fromiter((-1 if d is None else d for d in digits), dtype=np.int8)
+
 def to_hex_string(digits):
-    out = []
-    for d in digits:
-        if d is None:
-            out.append('.')  
-        else:
-            out.append(hex(d)[2:].upper())
-    return ''.join(out)
+    nib = _nibbles(digits)
+    return HEX_UPPER[np.where(nib >= 0, nib, 16)].tobytes().decode()
 
 def compact_hex(digits):
-    return ''.join(hex(d)[2:] if d is not None else '' for d in digits)
+    return hex_from_nibbles(_nibbles(digits))
 
 def try_hex_align(hex_str):
     """
-    We observed an odd # of nibbles. Try two alignments by trimming 1 nibble
-    either at start or at end, then hex-decode and measure 'english' score.
+    Score both nibble alignments of the hex (see glyphs.score_alignments):
+    printable share plus a bonus per keyword found -> [(score, hex, bytes)],
+    best first.
     """
-    import binascii
-    cands = []
-    if len(hex_str) % 2 == 1:
-        a = hex_str[1:]
-        try:
-            cands.append((a, binascii.unhexlify(a)))
-        except Exception:
-            pass
-        b = hex_str[:-1]
-        try:
-            cands.append((b, binascii.unhexlify(b)))
-        except Exception:
-            pass
-    else:
-        try:
-            cands.append((hex_str, bytes.fromhex(hex_str)))
-        except Exception:
-            pass
-    def score(bs):
-        s = bs.decode('utf-8', errors='ignore')
-        printable = sum(1 for ch in s if 32 <= ord(ch) <= 126)/max(1,len(s))
-        bonus = 0
-        for tok in ["hardware","capture","logic","flag","saleae","digital","analog"]:
-            if tok in s.lower():
-                bonus += 0.5
-        return printable + bonus, s
-    scored = sorted([(score(bs)[0], hx, bs) for hx,bs in cands], reverse=True)
-    return scored
+    return [(sc, hex_str[off:off + 2 * len(bs)], bs)
+            for sc, off, bs in score_alignments(nibbles_from_hex(hex_str))]
 
 def main():
     path = sys.argv[1] if len(sys.argv)>1 else "digital.csv"
-    last_states = read_csv_last_states(path)
-    digits = decode_digits(last_states)
+    gap, confidence = estimate_gap_threshold(path)
+    print(f"[*] gap threshold = {gap:.6g}s (confidence {confidence:.3f})")
+    digits = decode_masks(last_state_masks(path, gap))
     hex_full = to_hex_string(digits)
     hex_compact = compact_hex(digits)
     print("[*] 7-seg (active-low):")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Estimate the burst-separating gap of a logic capture from its inter-transition
+gap distribution instead of guessing --gap by hand.
+
+Gaps inside a burst (a digit being latched) and gaps between bursts (the digit
+being displayed) sit several decades apart, so their log10 histogram is
+bimodal.  The threshold is Otsu's split of that histogram, placed in the middle
+of the empty valley between the two modes; the confidence is Otsu's
+separability eta = between-class / total variance, in [0, 1].
+
+The histogram has fixed log-spaced bins, so it can be accumulated block by
+block while streaming and costs constant memory.
+
+Usage:
+    python gaps.py [digital.csv | capture.sal.zip | capture.sal/]
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+LOG_EDGES = np.linspace(-9, 3, 12 * 40 + 1)  # 1 ns .. 1000 s, 40 bins per decade
+DEFAULT_GAP = 0.01                             # fallback when there is nothing to split
+
+
+def gap_histogram(times: np.ndarray, hist: np.ndarray | None = None) -> np.ndarray:
+    """Add the positive gaps of `times` to a log10 gap histogram (a new one if hist is None)."""
+    if hist is None:
+        hist = np.zeros(len(LOG_EDGES) - 1, dtype=np.int64)
+    gaps = np.diff(np.asarray(times, dtype=np.float64))
+    gaps = np.log10(gaps[gaps > 0])
+    hist += np.histogram(np.clip(gaps, LOG_EDGES[0], LOG_EDGES[-1]), bins=LOG_EDGES)[0]
+    return hist
+
+
+def threshold_from_histogram(hist: np.ndarray) -> tuple[float, float]:
+    """Otsu split of a log10 gap histogram -> (gap threshold [s], confidence)."""
+    total = hist.sum()
+    if total < 2:
+        return DEFAULT_GAP, 0.0
+    p = hist / total
+    centers = (LOG_EDGES[:-1] + LOG_EDGES[1:]) / 2
+    omega = np.cumsum(p)[:-1]
+    mu = np.cumsum(p * centers)[:-1]
+    mu_t = (p * centers).sum()
+    var_t = (p * (centers - mu_t) ** 2).sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = np.where((omega > 0) & (omega < 1), (mu_t * omega - mu) ** 2 / (omega * (1 - omega)), 0.0)
+    if var_t <= 0 or between.max() <= 0:
+        return DEFAULT_GAP, 0.0
+
+    # Every split inside the empty valley scores the same; take the middle of that run
+    best = int(between.argmax())
+    flat = np.flatnonzero(between[best:] < between[best] * (1 - 1e-9))
+    last = best + (int(flat[0]) - 1 if len(flat) else len(between) - 1 - best)
+    log_gap = (LOG_EDGES[best + 1] + LOG_EDGES[last + 1]) / 2
+    return float(10 ** log_gap), float(min(1.0, between[best] / var_t))
+
+
+def estimate_gap(times: np.ndarray) -> tuple[float, float]:
+    """Estimate the burst gap threshold of one array of timestamps -> (gap [s], confidence)."""
+    return threshold_from_histogram(gap_histogram(times))
+
+
+def main():
+    from colcache import open_capture
+    path = Path(sys.argv[1] if len(sys.argv) > 1 else 'digital.csv')
+    gap, confidence = estimate_gap(open_capture(path)[0])
+    print(f'[*] Gap threshold: {gap:.6g} s (confidence {confidence:.3f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+7-segment glyph tables and hex scoring shared by segment.py and ex.py.
+
+Masks are segment masks: bit i set = segment 'abcdefg'[i] lit.  Every table
+is a 128-entry array indexed by mask, so decoding a burst sequence is one
+fancy-indexing step.
+
+Decoded digits are nibble arrays (int8, -1 = not a hex digit).  Bytes are
+packed from them with array ops, and score_alignments rates both nibble
+alignments at once: printable share from the packed bytes, keyword hits from a
+single pass of a keyword automaton that runs on nibbles rather than bytes, so a
+match's end parity tells which alignment it belongs to.
+
+Usage:
+    python glyphs.py HEX   # score both alignments of a hex string
+"""
+
+import sys
+from functools import lru_cache
+from itertools import accumulate
+
+import numpy as np
+
+SEGMENTS = 'abcdefg'
+# Canonical 7‑seg glyphs (hex digits + a few letters) as sets of segments that are ON
+SEG_CHARS = {
+    '0': set('abcdef'),
+    '1': set('bc'),
+    '2': set('abged'),
+    '3': set('abgcd'),
+    '4': set('fgbc'),
+    '5': set('afgcd'),
+    '6': set('afgcde'),
+    '7': set('abc'),
+    '8': set('abcdefg'),
+    '9': set('abcfgd'),
+    'A': set('abcefg'),
+    'b': set('fgcde'),
+    'C': set('afed'),
+    'c': set('ged'),
+    'd': set('gbcde'),
+    'E': set('afged'),
+    'F': set('afge'),
+    '-': set('g'),
+    ' ': set(),
+}
+
+# Prefer to decode to these characters when multiple glyphs share the same segments
+PREF_ORDER = ['0','1','2','3','4','5','6','7','8','9','A','E','F','C','d','b','c','-',' ']
+
+KEYWORDS = ('hardware', 'capture', 'logic', 'flag', 'saleae', 'digital', 'analog')
+
+
+def glyph_mask(ch: str) -> int:
+    return sum(1 << SEGMENTS.index(s) for s in SEG_CHARS[ch])
+
+
+# mask -> glyph ('?' if none), mask -> nibble value (-1 if not a hex digit)
+GLYPH_LUT = np.full(128, '?', dtype='<U1')
+for _ch in PREF_ORDER:
+    GLYPH_LUT[glyph_mask(_ch)] = _ch
+GLYPH_LUT_VALID = GLYPH_LUT != '?'
+NIBBLE_LUT = np.array([int(c, 16) if c in '0123456789ABCDEFabcdef' else -1 for c in GLYPH_LUT], dtype=np.int8)
+# nibble -> mask of its canonical glyph
+HEX_MASKS = np.array([glyph_mask(c) for c in '0123456789AbCdEF'], dtype=np.uint8)
+
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+# ASCII byte -> nibble value (-1 if not a hex digit)
+ASCII_NIBBLE = np.full(256, -1, dtype=np.int8)
+ASCII_NIBBLE[HEX_DIGITS] = np.arange(16)
+ASCII_NIBBLE[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+
+
+def nibbles_from_hex(text: str) -> np.ndarray:
+    """Hex text -> int8 nibble array (-1 where a character is not a hex digit)."""
+    return ASCII_NIBBLE[np.frombuffer(text.encode('latin-1', errors='replace'), dtype=np.uint8)]
+
+
+def hex_from_nibbles(nibbles: np.ndarray) -> str:
+    """Nibble array -> lowercase hex text, skipping invalid (-1) nibbles."""
+    nibbles = np.asarray(nibbles)
+    return HEX_DIGITS[nibbles[nibbles >= 0]].tobytes().decode('ascii')
+
+
+def pack_nibbles(nibbles: np.ndarray, offset: int = 0) -> bytes:
+    """Valid nibbles -> bytes, pairing them from `offset` on and dropping a trailing odd nibble."""
+    nib = np.asarray(nibbles)
+    nib = nib[nib >= 0][offset:].astype(np.uint8)
+    nib = nib[:len(nib) & ~1]
+    return ((nib[0::2] << 4) | nib[1::2]).tobytes()
+
+
+@lru_cache(maxsize=None)
+def keyword_automaton(keywords: tuple[str, ...] = KEYWORDS) -> tuple[list[list[int]], np.ndarray]:
+    """
+    DFA over nibbles matching the keywords case-insensitively, as their bytes
+    appear in a hex stream -> (table[state][nibble] -> state, accept[state] =
+    bitmask of keywords ending at that state).  Letters only differ in bit 5,
+    i.e. in the high nibble, so each keyword is a sequence of nibble sets.
+    """
+    patterns = []
+    for kw in keywords:
+        pat = []
+        for b in kw.encode():
+            cases = {b, b ^ 0x20} if chr(b).isalpha() else {b}
+            pat += [frozenset(c >> 4 for c in cases), frozenset(c & 0xf for c in cases)]
+        patterns.append(pat)
+
+    # Subset construction: a state is the set of (keyword, matched nibbles) in progress
+    start = frozenset()
+    index = {start: 0}
+    queue = [start]
+    table, accept = [], []
+    while queue:
+        state = queue.pop(0)
+        live = state | {(k, 0) for k in range(len(patterns))}
+        row = []
+        for x in range(16):
+            nxt = frozenset((k, i + 1) for k, i in live if i < len(patterns[k]) and x in patterns[k][i])
+            if nxt not in index:
+                index[nxt] = len(index)
+                queue.append(nxt)
+            row.append(index[nxt])
+        table.append(row)
+        accept.append(sum(1 << k for k, i in state if i == len(patterns[k])))
+    return table, np.array(accept, dtype=np.int64)
+
+
+def score_alignments(nibbles: np.ndarray, keywords: tuple[str, ...] = KEYWORDS) -> list[tuple[float, int, bytes]]:
+    """
+    Score both byte alignments of a nibble stream (offset 0 and 1) ->
+    [(score, offset, bytes)], best first.  The score is the printable share of
+    the bytes plus 0.5 per keyword found (case-insensitive).
+    """
+    nib = np.asarray(nibbles)
+    nib = nib[nib >= 0]
+    table, accept = keyword_automaton(tuple(keywords))
+    states = np.fromiter(accumulate(nib.tolist(), lambda s, x: table[s][x], initial=0), dtype=np.int64, count=len(nib) + 1)
+    hits = accept[states[1:]]
+
+    scored = []
+    for offset in (0, 1):
+        data = pack_nibbles(nib, offset)
+        arr = np.frombuffer(data, dtype=np.uint8)
+        printable = np.count_nonzero((arr >= 32) & (arr <= 126)) / max(1, len(arr))
+        # A keyword in alignment `offset` ends on a nibble of the other parity, inside the paired range
+        found = np.bitwise_or.reduce(hits[offset + 1:offset + 2 * len(arr):2]) if len(arr) else 0
+        scored.append((float(printable + 0.5 * bin(int(found)).count('1')), offset, data))
+    return sorted(scored, key=lambda s: s[0], reverse=True)
+
+
+def main():
+    for score, offset, data in score_alignments(nibbles_from_hex(sys.argv[1] if len(sys.argv) > 1 else '')):
+        print(f'score={score:.3f} offset={offset} ascii={data.decode("utf-8", errors="replace")!r}')
+
+
+if __name__ == '__main__':
+    main()
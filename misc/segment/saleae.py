@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Read a Saleae Logic 2 capture (.sal zip or an extracted capture.sal/ directory)
+straight into NumPy arrays, without going through the CSV export.
+
+Layout of capture.sal/digital-N.bin (version 2, type 100), little-endian:
+
+    char[8]  "<SALEAE>"
+    int32    version            (2)
+    int32    type               (100 = digital)
+    uint8    reserved
+    float64  sample_rate        (Hz)
+    int64    capture start      (unix ms)
+    float64  capture start      (fractional ms)
+    uint16   reserved
+    uint64   num_chunks
+    chunk[num_chunks]:
+        int64   first sample
+        int64   last sample (exclusive)
+        uint8   state at first sample
+        uint8   reserved
+        uint64  payload size
+        uint8[] payload: run lengths, one varint per run, state toggling
+                after each run
+
+Each varint stores (run length - 1) big-endian: a lead byte 0b01xxxxxx with the
+top 6 bits, zero or more 0b1xxxxxxx continuation bytes, and a final 0b0xxxxxxx
+byte.  Since only lead and final bytes have bit 7 clear they strictly
+alternate, which lets the whole payload be decoded with array ops.
+
+Usage:
+    python saleae.py [capture.sal.zip | capture.sal/]   # prints the state table
+"""
+
+import json
+import struct
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b'<SALEAE>'
+FILE_HEADER = struct.Struct('<8siiBdqdHQ')
+CHUNK_HEADER = struct.Struct('<qqBBQ')
+BLOCK_BYTES = 1 << 20  # payload bytes decoded per channel per step when streaming
+
+
+def _open_capture(path: Path):
+    """Return a callable name -> binary file object for a .sal/.zip archive or a directory."""
+    if path.is_dir():
+        return lambda name: open(path / name, 'rb')
+    zf = zipfile.ZipFile(path)
+    return lambda name: zf.open(name)
+
+
+def _decode_varints(payload: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Decode back-to-back run-length varints -> (values, byte offset of each lead byte)."""
+    low = np.flatnonzero(payload < 0x80)
+    heads, tails = low[0::2], low[1::2]
+    if len(low) % 2 or (len(heads) and (heads[0] != 0 or tails[-1] != len(payload) - 1
+                                        or np.any(heads[1:] != tails[:-1] + 1)
+                                        or not np.all(payload[heads] & 0x40))):
+        raise ValueError('malformed run-length payload')
+    if not len(heads):
+        return np.zeros(0, dtype=np.int64), heads
+
+    # Every byte contributes 7 bits (6 for the lead byte), shifted by its distance to the tail
+    owner = np.zeros(len(payload), dtype=np.int64)
+    owner[heads[1:]] = 1
+    owner = np.cumsum(owner)
+    digits = (payload & 0x7f).astype(np.uint64)
+    digits[heads] &= np.uint64(0x3f)
+    shift = ((tails[owner] - np.arange(len(payload))) * 7).astype(np.uint64)
+    return np.add.reduceat(digits << shift, heads).astype(np.int64), heads
+
+
+def merge_edges(arrays: list[np.ndarray]) -> np.ndarray:
+    """Sorted union of sample arrays (cheaper than np.unique's hashing for these sizes)."""
+    s = np.sort(np.concatenate(arrays))
+    return s[np.r_[True, s[1:] != s[:-1]]] if len(s) else s
+
+
+def _read_header(fp) -> tuple[float, int]:
+    """Consume the digital-N.bin file header -> (sample_rate, num_chunks)."""
+    magic, version, kind, _, rate, _, _, _, num_chunks = FILE_HEADER.unpack(fp.read(FILE_HEADER.size))
+    if magic != MAGIC or version != 2 or kind != 100:
+        raise ValueError(f'unsupported Saleae binary (version={version}, type={kind})')
+    return rate, num_chunks
+
+
+def _decode_runs(starts: np.ndarray, ends: np.ndarray, states: np.ndarray,
+                 payloads: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    """Expand a batch of chunks -> (run start samples, run states)."""
+    sizes = np.array([len(p) for p in payloads], dtype=np.int64)
+    values, heads = _decode_varints(np.frombuffer(b''.join(payloads), dtype=np.uint8))
+    runs = values + 1
+
+    # Assign each run to its chunk and lay it out on the absolute sample axis
+    chunk = np.searchsorted(np.cumsum(sizes) - sizes, heads, side='right') - 1
+    first = np.r_[True, chunk[1:] != chunk[:-1]]
+    csum = np.cumsum(runs)
+    base = np.maximum.accumulate(np.where(first, csum - runs, 0))
+    run_start = starts[chunk] + (csum - runs - base)
+    run_index = np.arange(len(runs)) - np.maximum.accumulate(np.where(first, np.arange(len(runs)), 0))
+    run_state = states[chunk] ^ (run_index & 1).astype(np.uint8)
+
+    covered = np.bincount(chunk, weights=runs, minlength=len(payloads))
+    if not np.array_equal(covered.astype(np.int64), ends - starts):
+        raise ValueError('run lengths do not add up to chunk spans')
+    return run_start, run_state
+
+
+def iter_channel(fp, num_chunks: int, block_bytes: int = BLOCK_BYTES):
+    """
+    Stream the chunks of one digital-N.bin (header already consumed), decoding
+    about block_bytes of payload at a time.
+
+    Yields (first_state, toggle samples, until): first_state is the channel
+    state at the start of the block, toggles are the samples where it flips,
+    and everything before `until` is final.
+    """
+    prev = None
+    done = 0
+    while done < num_chunks:
+        starts, ends, states, payloads = [], [], [], []
+        pending = 0
+        while done < num_chunks and pending < block_bytes:
+            start, end, state, _, size = CHUNK_HEADER.unpack(fp.read(CHUNK_HEADER.size))
+            starts.append(start)
+            ends.append(end)
+            states.append(state)
+            payloads.append(fp.read(size))
+            pending += size
+            done += 1
+        run_start, run_state = _decode_runs(np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64),
+                                            np.array(states, dtype=np.uint8), payloads)
+        if not len(run_state):
+            continue
+        before = run_state[0] if prev is None else prev
+        toggles = np.flatnonzero(run_state != np.r_[before, run_state[:-1]])
+        yield int(before), run_start[toggles], ends[-1]
+        prev = run_state[-1]
+
+
+def iter_sal(path: Path, block_bytes: int = BLOCK_BYTES):
+    """
+    Stream a capture as blocks of the merged state table, matching the Saleae
+    CSV export: one row per instant any channel changes, plus t=0 and the end
+    of capture.  Memory stays bounded by block_bytes per channel.
+
+    Yields (times [s] float64, states uint8 of shape (rows, channels)).
+    """
+    open_member = _open_capture(Path(path))
+    with open_member('meta.json') as f:
+        meta = json.load(f)
+    bins = sorted(meta['binData'], key=lambda b: b['deviceChannel'])
+
+    files = [open_member(Path(b['file']).name) for b in bins]
+    headers = [_read_header(fp) for fp in files]
+    rate = headers[0][0] if headers else 1.0
+    streams = [iter_channel(fp, num_chunks, block_bytes) for fp, (_, num_chunks) in zip(files, headers)]
+    n = len(streams)
+    state = [0] * n                 # channel state at `lo`
+    pending = [np.zeros(0, dtype=np.int64) for _ in range(n)]
+    until = [0] * n
+    live = [True] * n
+    lo = None                       # every row before this sample has been emitted
+
+    def pull(ch, initial=False):
+        try:
+            first, toggles, until[ch] = next(streams[ch])
+        except StopIteration:
+            live[ch] = False
+            return
+        if initial:
+            state[ch] = first
+        pending[ch] = np.concatenate([pending[ch], toggles])
+
+    def emit(frontier, final=False):
+        cut = [np.searchsorted(p, frontier, side='right' if final else 'left') for p in pending]
+        head = [p[:k] for p, k in zip(pending, cut)]
+        extra = [0] if lo is None else []
+        if final:
+            extra.append(frontier)
+        samples = merge_edges([np.array(extra, dtype=np.int64), *head])
+        states = np.empty((len(samples), n), dtype=np.uint8)
+        for ch in range(n):
+            flips = np.searchsorted(head[ch], samples, side='right')
+            states[:, ch] = state[ch] ^ (flips & 1)
+            state[ch] ^= len(head[ch]) & 1
+            pending[ch] = pending[ch][cut[ch]:]
+        return samples / rate, states
+
+    try:
+        for ch in range(n):
+            pull(ch, initial=True)
+        while any(live):
+            ch = min((c for c in range(n) if live[c]), key=lambda c: until[c])
+            pull(ch)
+            frontier = min((until[c] for c in range(n) if live[c]), default=None)
+            if frontier is not None and frontier != lo:
+                yield emit(frontier)
+                lo = frontier
+        yield emit(max(until, default=0), final=True)
+    finally:
+        for fp in files:
+            fp.close()
+
+
+def read_sal(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    """Load a whole capture into one merged state table (see iter_sal)."""
+    blocks = list(iter_sal(path, block_bytes=1 << 62))
+    return np.concatenate([t for t, _ in blocks]), np.concatenate([s for _, s in blocks])
+
+
+def main():
+    path = Path(sys.argv[1] if len(sys.argv) > 1 else 'capture.sal.zip')
+    times, states = read_sal(path)
+    print('Time [s],' + ','.join(f'Channel {i}' for i in range(states.shape[1])))
+    for t, row in zip(times, states):
+        print(f'{t:.9f},' + ','.join(str(v) for v in row))
+
+
+if __name__ == '__main__':
+    main()
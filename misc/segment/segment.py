@@ -6,77 +6,237 @@ where channels 0..6 drive a 7‑segment display (active‑low) and each
 hex, which in turn decodes to ASCII and (likely) a CTF flag.
 
 Input:  digital.csv  (Saleae CSV: columns = Time [s], Channel 0..7)
+        or capture.sal / capture.sal.zip / capture.sal/ (native Logic 2 capture)
 Output: prints decoded characters and best flag guess; writes /mnt/data/decoded.txt
 
 Usage:
-    python decode_7seg_flag.py [--csv PATH] [--gap 0.01]
+    python decode_7seg_flag.py [--csv PATH | --sal PATH] [--gap auto|0.01] [--glitch 1e-6] [--stream | --auto-perm]
 
 Notes:
 - Channel mapping assumed: Channel 0..6 -> segments a..g (active‑low).
-- If your wiring differs, add a PERM tuple to remap channels.
-- We use majority vote within each burst (more robust than last sample).
+- If your wiring differs, pass --perm, or let --auto-perm score all 5040
+  channel->segment permutations in both polarities and pick the one that
+  decodes the most bursts to valid glyphs (printable ASCII breaks ties).
+- We use majority vote within each burst, each state weighted by how long it
+  lasted, so the settled digit outweighs the edges of the burst; --glitch
+  additionally drops states shorter than that many seconds (contact bounce,
+  glitches), like the Logic 2 glitch filter but after the fact.
+- --gap auto (default) picks the burst gap from the log‑gap histogram of the
+  capture (see gaps.py) and reports how clearly the two modes separate.
+- --sal reads the digital-N.bin transition streams directly (see saleae.py),
+  skipping the CSV export entirely.
+- The first run parses the capture into a memory‑mapped columnar cache next to
+  it (CAPTURE.cache/, see colcache.py); later runs skip parsing entirely.
+- --stream decodes block by block in bounded memory and prints glyphs as each
+  burst closes, for captures too large to load at once.
 """
 
 import argparse
-import pandas as pd
 import numpy as np
 import re
+from itertools import chain, permutations
 from pathlib import Path
 
-SEGMENTS = list('abcdefg')
-# Canonical 7‑seg glyphs (hex digits + a few letters) as sets of segments that are ON
-SEG_CHARS = {
-    '0': set('abcdef'),
-    '1': set('bc'),
-    '2': set('abged'),
-    '3': set('abgcd'),
-    '4': set('fgbc'),
-    '5': set('afgcd'),
-    '6': set('afgcde'),
-    '7': set('abc'),
-    '8': set('abcdefg'),
-    '9': set('abcfgd'),
-    'A': set('abcefg'),
-    'b': set('fgcde'),
-    'C': set('afed'),
-    'c': set('ged'),
-    'd': set('gbcde'),
-    'E': set('afged'),
-    'F': set('afge'),
-    '-': set('g'),
-    ' ': set(),
-}
-
-# Prefer to decode to these characters when multiple glyphs share the same segments
-PREF_ORDER = ['0','1','2','3','4','5','6','7','8','9','A','E','F','C','d','b','c','-',' ']
-SEG_TO_CHAR = {frozenset(SEG_CHARS[ch]): ch for ch in PREF_ORDER}
-
-
-def group_indices(times: np.ndarray, gap_threshold: float) -> list[tuple[int,int]]:
-    gaps = np.diff(times)
-    groups = []
-    start = 0
-    for i, g in enumerate(gaps, start=1):
-        if g > gap_threshold:
-            groups.append((start, i-1))
-            start = i
-    groups.append((start, len(times)-1))
-    return groups
-
-
-def decode_group_majority(df: pd.DataFrame, s: int, e: int, perm: tuple[int,...]) -> str:
-    """Majority vote per channel within [s,e], active‑low, then map to glyph."""
-    sub = df.iloc[s:e+1]
-    on_bits = []  # 1 = segment ON
-    for ch in range(7):
-        vals = sub[f'Channel {ch}'].to_numpy()
-        ones = int(vals.sum())
-        zeros = len(vals) - ones
-        bit = 1 if ones > zeros else 0 if zeros > ones else int(vals[-1])
-        on_bits.append(1 - bit)  # active‑low
-    # Apply channel->segment permutation
-    on_segs = {SEGMENTS[perm[i]] for i, v in enumerate(on_bits) if v == 1}
-    return SEG_TO_CHAR.get(frozenset(on_segs), '?')
+from colcache import CHUNK_ROWS, iter_capture, open_capture, unpack_states
+from gaps import estimate_gap
+from glyphs import GLYPH_LUT, GLYPH_LUT_VALID, NIBBLE_LUT
+
+SEARCH_CELLS = 1 << 22  # candidates x bursts scored per batch in --auto-perm
+
+
+def group_indices(times: np.ndarray, gap_threshold: float) -> np.ndarray:
+    """Split rows into bursts wherever the time gap exceeds gap_threshold -> int64[k, 2] of (start, end)."""
+    breaks = np.flatnonzero(np.diff(times) > gap_threshold) + 1
+    return np.column_stack([np.r_[0, breaks], np.r_[breaks - 1, len(times) - 1]])
+
+
+def perm_lut(perm: tuple[int,...]) -> np.ndarray:
+    """128‑entry table remapping a channel mask (bit i = Channel i) to a segment mask."""
+    masks = np.arange(128)
+    out = np.zeros(128, dtype=np.uint8)
+    for ch, seg in enumerate(perm):
+        out |= (((masks >> ch) & 1) << seg).astype(np.uint8)
+    return out
+
+
+def _kept_rows(times: np.ndarray, states: np.ndarray, glitch: float, end: float) -> np.ndarray:
+    """
+    Indices of the rows that survive the glitch filter: row i lasts until
+    times[i+1] (the last one until `end`) and is dropped if that is shorter than
+    `glitch` seconds, then rows that no longer change any channel are dropped.
+    Row 0 is always kept.
+    """
+    if not len(times):
+        return np.zeros(0, dtype=np.int64)
+    keep = np.diff(times, append=end) >= glitch
+    keep[0] = True
+    idx = np.flatnonzero(keep)
+    kept = states[idx]
+    return idx[np.r_[True, np.any(kept[1:] != kept[:-1], axis=1)]]
+
+
+def debounce(times: np.ndarray, states: np.ndarray, glitch: float = 0.0):
+    """
+    Glitch/debounce stage: drop rows whose state lasts less than `glitch`
+    seconds and rows that repeat the previous state, then weight every
+    remaining row by how long its state lasted (the last row until the end of
+    the capture).  Returns (times, states, durations [s]).
+    """
+    idx = _kept_rows(times, states, glitch, times[-1] if len(times) else 0.0)
+    kept = times[idx]
+    return kept, states[idx], np.diff(kept, append=times[-1] if len(times) else 0.0)
+
+
+def iter_debounced(blocks, glitch: float = 0.0):
+    """
+    Streaming debounce: consume (times, states) blocks and yield (times, states,
+    durations) blocks identical, once joined, to debounce() on the whole
+    capture.  Only the last kept row and the last raw row (whose durations
+    depend on the next block) are carried across block boundaries.
+    """
+    held = None
+    for times, states in blocks:
+        if not len(times):
+            continue
+        if held is not None:
+            times, states = np.r_[held[0], times], np.vstack([held[1], states])
+        idx = _kept_rows(times[:-1], states[:-1], glitch, times[-1])
+        if not len(idx):
+            held = times, states
+            continue
+        kept = times[idx]
+        yield kept[:-1], states[idx[:-1]], np.diff(kept)
+        held = times[[idx[-1], -1]], states[[idx[-1], -1]]
+
+    if held is not None:
+        yield debounce(*held, glitch)
+
+
+def burst_masks(states: np.ndarray, groups: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+    """
+    Majority vote per channel within each burst, active‑low -> uint8 channel
+    mask of ON segments.  Each row counts by its weight (e.g. the durations
+    from debounce()); every row counts once if weights is None.
+    """
+    if not len(groups):
+        return np.zeros(0, dtype=np.uint8)
+    starts, ends = groups[:, 0], groups[:, 1]
+    sub = states[:, :7]
+    if weights is None:
+        ones = np.add.reduceat(sub, starts, axis=0, dtype=np.int64)
+        return _majority_masks(ones, ends - starts + 1, sub[ends])
+    ones = np.add.reduceat(sub * weights[:, None], starts, axis=0)
+    return _majority_masks(ones, np.add.reduceat(weights, starts), sub[ends])
+
+
+def _majority_masks(ones: np.ndarray, n: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Per‑burst (weighted) ones counts, total weights and last rows -> uint8 channel mask of ON segments."""
+    n = np.asarray(n)[:, None]
+    # Ties (including bursts of zero total weight) fall back to the last sample of the burst
+    bits = np.where(2 * ones > n, 1, np.where(2 * ones < n, 0, last))
+    on = (1 - bits).astype(np.uint8)  # active‑low
+    return (on << np.arange(7, dtype=np.uint8)).sum(axis=1, dtype=np.uint8)
+
+
+def iter_burst_masks(blocks, gap_threshold: float):
+    """
+    Streaming burst_masks: consume (times, states, weights) blocks (see
+    iter_debounced) and yield the masks of the bursts each block closes.  Only
+    the open burst's per‑channel sums are carried across block boundaries, so
+    memory does not grow with the capture.
+    """
+    carry = None  # open burst: (weighted ones per channel, total weight, last row, last time)
+    for times, states, weights in blocks:
+        if not len(times):
+            continue
+        sub = states[:, :7]
+        starts = np.r_[0, np.flatnonzero(np.diff(times) > gap_threshold) + 1]
+        ones = np.add.reduceat(sub * weights[:, None], starts, axis=0)
+        n = np.add.reduceat(weights, starts)
+        last = sub[np.r_[starts[1:], len(times)] - 1]
+
+        if carry is not None:
+            c_ones, c_n, c_last, c_time = carry
+            if times[0] - c_time > gap_threshold:
+                ones = np.vstack([c_ones, ones])
+                n = np.r_[c_n, n]
+                last = np.vstack([c_last, last])
+            else:
+                ones[0] += c_ones[0]
+                n[0] += c_n[0]
+        carry = ones[-1:], n[-1:], last[-1:], times[-1]
+        yield _majority_masks(ones[:-1], n[:-1], last[:-1])
+
+    if carry is not None:
+        yield _majority_masks(*carry[:3])
+
+
+def decode_masks(masks: np.ndarray, perm: tuple[int,...], active_low: bool = True) -> str:
+    """Apply the channel->segment permutation and map every burst mask to its glyph."""
+    if not active_low:
+        masks = masks ^ np.uint8(0x7f)
+    return ''.join(GLYPH_LUT[perm_lut(perm)[masks]])
+
+
+def _printable_share(nib: np.ndarray, seq: np.ndarray) -> np.ndarray:
+    """
+    nib[k, u] maps each distinct burst mask to a nibble (‑1 = not hex) for k
+    candidates; seq indexes the burst sequence into those u masks.  Returns the
+    printable share of each candidate's hex->ASCII bytes.
+    """
+    nib = nib[:, seq]
+    is_hex = nib >= 0
+    # Pair up hex nibbles in order, dropping the first one if odd (as clean_hex does)
+    rank = np.cumsum(is_hex, axis=1, dtype=np.int32) - (is_hex.sum(axis=1, dtype=np.int32) % 2)[:, None]
+    hi = is_hex & (rank % 2 == 1)
+    # Index of the next hex nibble after each position (seq.size when none is left)
+    pos = np.where(is_hex, np.arange(seq.size, dtype=np.int32), seq.size)
+    nxt = np.minimum.accumulate(pos[:, ::-1], axis=1)[:, ::-1]
+    nxt = np.concatenate([nxt[:, 1:], np.full((len(nib), 1), seq.size, dtype=np.int32)], axis=1)
+    lo = np.take_along_axis(np.pad(nib, ((0, 0), (0, 1))), nxt, axis=1)
+    byte = (nib.astype(np.int16) << 4) | lo
+    return (hi & (byte >= 32) & (byte <= 126)).sum(axis=1) / np.maximum(hi.sum(axis=1), 1)
+
+
+def search_perms(masks: np.ndarray, top: int = 5) -> list[dict]:
+    """
+    Try every channel->segment permutation in both polarities against the burst
+    masks and return the best candidates, ranked by valid glyph share and, among
+    equally valid ones, by the printable share of the hex->ASCII result.
+
+    Each candidate is just a 128‑entry bit‑remap table over masks decoded once.
+    Valid shares come from the mask histogram for all 10080 candidates at once;
+    printability is then computed in batches in order of falling validity,
+    deduplicating candidates that agree on every mask present, and stops once
+    the remaining candidates are less valid than the top ones.
+    """
+    perms = np.array(list(permutations(range(7))), dtype=np.uint8)
+    bits = (np.arange(128)[:, None] >> np.arange(7)) & 1
+    luts = (bits[None, :, :] << perms[:, None, :]).sum(axis=2).astype(np.uint8)
+    luts = np.concatenate([luts, luts[:, np.arange(128) ^ 0x7f]])  # active‑low, then active‑high
+
+    present, seq = np.unique(masks, return_inverse=True)
+    counts = np.bincount(seq, minlength=len(present))
+    valid = GLYPH_LUT_VALID[luts[:, present]] @ counts / max(1, masks.size)
+    printable = np.full(len(luts), -np.inf)
+
+    order = np.argsort(-valid, kind='stable')
+    step = max(1, SEARCH_CELLS // max(1, masks.size))
+    for i in range(0, len(order), step):
+        idx = order[i:i+step]
+        # Printability only breaks ties in validity, so nothing less valid than the top-th candidate can rank
+        if valid[idx[0]] < valid[order[min(top, len(order)) - 1]]:
+            break
+        rows, inverse = np.unique(NIBBLE_LUT[luts[idx][:, present]], axis=0, return_inverse=True)
+        printable[idx] = _printable_share(rows, seq)[inverse.ravel()]
+
+    best = np.lexsort((-printable, -valid))[:top]
+    return [{
+        'perm': tuple(int(x) for x in perms[i % len(perms)]),
+        'active_low': bool(i < len(perms)),
+        'valid_share': float(valid[i]),
+        'printable_share': float(printable[i]),
+    } for i in best]
 
 
 def clean_hex(s: str) -> str:
@@ -87,14 +247,42 @@ def clean_hex(s: str) -> str:
     return s
 
 
-def try_decode(csv_path: Path, gap: float, perm: tuple[int,...]) -> dict:
-    df = pd.read_csv(csv_path)
-    times = df['Time [s]'].to_numpy()
+def load_capture(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    """Return (times, states[rows, channels]) from a Saleae CSV export or a native .sal capture (via colcache)."""
+    times, codes, channels = open_capture(path)
+    return times, unpack_states(codes, channels)
+
+
+def iter_glyphs(blocks, gap: float, perm: tuple[int,...]):
+    """Yield the glyphs of the bursts closed by each (times, states, weights) block, as soon as that block is read."""
+    lut = GLYPH_LUT[perm_lut(perm)]
+    for masks in iter_burst_masks(blocks, gap):
+        yield ''.join(lut[masks])
+
+
+def try_decode(capture_path: Path, gap: float | None, perm: tuple[int,...], auto_perm: bool = False,
+               glitch: float = 0.0) -> dict:
+    """Decode a whole capture; gap=None estimates the burst gap from the capture itself."""
+    times, states, weights = debounce(*load_capture(capture_path), glitch)
+    confidence = None
+    if gap is None:
+        gap, confidence = estimate_gap(times)
     groups = group_indices(times, gap)
+    masks = burst_masks(states, groups, weights)
+    if not auto_perm:
+        return summarize(decode_masks(masks, perm), gap, confidence)
+
+    candidates = search_perms(masks)
+    for c in candidates:
+        c['ascii_from_hex'] = summarize(decode_masks(masks, c['perm'], c['active_low']))['ascii_from_hex']
+    best = candidates[0]
+    out = summarize(decode_masks(masks, best['perm'], best['active_low']), gap, confidence)
+    out['perm_candidates'] = candidates
+    return out
 
-    chars = [decode_group_majority(df, s, e, perm) for s, e in groups]
-    text = ''.join(chars)
 
+def summarize(text: str, gap: float | None = None, gap_confidence: float | None = None) -> dict:
+    """Turn decoded 7‑seg text into hex, ASCII and flag candidates."""
     hex_str = clean_hex(text)
     bytes_raw = bytes.fromhex(hex_str) if hex_str else b''
     ascii_txt = bytes_raw.decode('ascii', errors='replace')
@@ -104,7 +292,9 @@ def try_decode(csv_path: Path, gap: float, perm: tuple[int,...]) -> dict:
 
     # Save
     out = {
-        'num_groups': len(groups),
+        'gap': gap,
+        'gap_confidence': gap_confidence,
+        'num_groups': len(text),
         'decoded_7seg': text,
         'hex_str': hex_str,
         'ascii_from_hex': ascii_txt,
@@ -116,14 +306,45 @@ def try_decode(csv_path: Path, gap: float, perm: tuple[int,...]) -> dict:
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--csv', default='digital.csv', help='Path to Saleae digital CSV export')
-    p.add_argument('--gap', type=float, default=0.01, help='Gap (seconds) separating bursts; default=0.01')
+    p.add_argument('--sal', help='Path to a native capture (.sal, .sal.zip or extracted directory); overrides --csv')
+    p.add_argument('--gap', default='auto', help='Gap (seconds) separating bursts, or "auto" to estimate it; default=auto')
     p.add_argument('--perm', default='0,1,2,3,4,5,6', help='Permutation mapping Channel 0..6 -> segments a..g (comma‑sep indices)')
+    p.add_argument('--stream', action='store_true', help='Decode block by block in bounded memory, printing glyphs as they close')
+    p.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help=f'CSV rows per block with --stream; default={CHUNK_ROWS}')
+    p.add_argument('--auto-perm', action='store_true', help='Search all channel->segment permutations and both polarities; ignores --perm')
+    p.add_argument('--glitch', type=float, default=0.0, help='Drop states lasting less than this many seconds (bounce, glitches); default=0')
     args = p.parse_args()
 
     perm = tuple(int(x) for x in args.perm.split(','))
     assert len(perm) == 7 and sorted(perm) == list(range(7)), 'perm must be a permutation of 0..6'
 
-    res = try_decode(Path(args.csv), args.gap, perm)
+    path = Path(args.sal or args.csv)
+    gap = None if args.gap == 'auto' else float(args.gap)
+    if args.stream:
+        blocks = iter_debounced(iter_capture(path, args.chunk_rows), args.glitch)
+        confidence = None
+        if gap is None:
+            # Estimate from the first block only, so output still starts right away
+            first = next(blocks, (np.zeros(0), np.zeros((0, 8), dtype=np.uint8), np.zeros(0)))
+            gap, confidence = estimate_gap(first[0])
+            blocks = chain([first], blocks)
+        pieces = []
+        print('[*] Streaming 7‑seg  : ', end='', flush=True)
+        for glyphs in iter_glyphs(blocks, gap, perm):
+            print(glyphs, end='', flush=True)
+            pieces.append(glyphs)
+        print()
+        res = summarize(''.join(pieces), gap, confidence)
+    else:
+        res = try_decode(path, gap, perm, auto_perm=args.auto_perm, glitch=args.glitch)
+
+    if res['gap_confidence'] is not None:
+        print(f"[*] Gap (auto)       : {res['gap']:.6g} s, confidence {res['gap_confidence']:.3f}")
+
+    for c in res.get('perm_candidates', []):
+        print(f"[*] perm={','.join(map(str, c['perm']))} {'active‑low ' if c['active_low'] else 'active‑high'}"
+              f"  valid={c['valid_share']:.2f} printable={c['printable_share']:.2f}"
+              f"  ascii={c['ascii_from_hex']!r}")
 
     print('[*] Groups           :', res['num_groups'])
     print('[*] 7‑seg decoded    :', res['decoded_7seg'])
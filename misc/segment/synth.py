@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic 7-segment logic capture for testing and benchmarking the
+decoders: an arbitrary payload is hex-encoded and every nibble is shown as one
+digit, latched channel by channel in a short burst and then held.  Channel 7
+toggles once per digit as a strobe, so repeated digits still get a burst.
+
+Writes the same two formats the decoders read:
+    OUT/digital.csv        Saleae CSV export (Time [s], Channel 0..7)
+    OUT/capture.sal/       meta.json + digital-N.bin (see saleae.py)
+    OUT/capture.sal.zip    the same, zipped (with --zip)
+
+Knobs: sample rate, hold time per digit, spacing of the per-channel edges,
+contact bounce (extra toggle pairs on every edge), glitches (short pulses
+while a digit is held), channel->segment wiring and polarity.
+
+Generation runs in blocks of digits, so 10^8-transition captures are written
+in bounded memory.
+
+Usage:
+    python synth.py OUT [--payload TEXT | --random N] [--rate 2e6] [--bounce 2] [--glitch-rate 0.01] [--perm 0,1,2,3,4,5,6] [--zip]
+"""
+
+import argparse
+import json
+import struct
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from glyphs import HEX_MASKS
+from saleae import CHUNK_HEADER, FILE_HEADER, MAGIC, merge_edges
+
+BLOCK_DIGITS = 1 << 15
+
+
+def _encode_varints(runs: np.ndarray) -> bytes:
+    """Inverse of saleae._decode_varints: run lengths -> lead/continuation/final bytes."""
+    v = runs.astype(np.uint64) - np.uint64(1)
+    # Bytes needed: 6 bits in the lead byte, 7 in each following one, at least two bytes
+    k = np.full(len(v), 2, dtype=np.int64)
+    for extra in range(1, 9):
+        k[v >= np.uint64(1) << np.uint64(6 + 7 * extra)] = 2 + extra
+    kmax = int(k.max()) if len(k) else 2
+    j = np.arange(kmax)                                    # byte position, 0 = lead
+    shift = (k[:, None] - 1 - j[None, :]) * 7
+    live = j[None, :] < k[:, None]
+    digits = (v[:, None] >> np.where(live, shift, 0).astype(np.uint64)) & np.uint64(0x7f)
+    out = np.where(j[None, :] == 0, np.uint64(0x40) | (digits & np.uint64(0x3f)),
+                   np.where(j[None, :] == (k[:, None] - 1), digits, np.uint64(0x80) | digits))
+    return out[live].astype(np.uint8).tobytes()
+
+
+def iter_toggles(payload: bytes, rate: float = 2e6, hold: float = 0.01, edge_step: float = 5e-6,
+                 bounce: int = 0, bounce_step: float = 5e-7, glitch_rate: float = 0.0,
+                 glitch_width: float = 5e-7, perm: tuple[int, ...] = (0, 1, 2, 3, 4, 5, 6),
+                 active_low: bool = True, seed: int = 0, block_digits: int = BLOCK_DIGITS):
+    """
+    Yield one list of per-channel toggle sample arrays per block of digits.
+    Blocks cover disjoint time windows, so callers can write them out in order.
+    """
+    rng = np.random.default_rng(seed)
+    step = max(1, round(edge_step * rate))
+    b_step = max(1, round(bounce_step * rate))
+    width = max(1, round(glitch_width * rate))
+    if 2 * bounce * b_step >= step:
+        raise ValueError('bounce does not fit between channel edges; lower --bounce or --bounce-step')
+    burst = 8 * step
+    period = burst + max(4 * width + 2, round(hold * rate))
+    lead = burst                                            # keep the t=0 row apart from the first burst
+
+    nibbles = np.frombuffer(payload.hex().encode(), dtype=np.uint8)
+    nibbles = np.where(nibbles >= ord('a'), nibbles - ord('a') + 10, nibbles - ord('0'))
+    seg_of_ch = np.array(perm, dtype=np.uint8)
+    level = np.ones(8, dtype=np.uint8) if active_low else np.r_[np.zeros(7, np.uint8), 1]  # display blank
+
+    for first in range(0, len(nibbles), block_digits):
+        digits = nibbles[first:first + block_digits]
+        n = len(digits)
+        bits = (HEX_MASKS[digits][:, None] >> seg_of_ch[None, :]) & 1
+        strobe = (first + np.arange(n) + 1) & 1 ^ 1
+        target = np.c_[bits ^ 1 if active_low else bits, strobe].astype(np.uint8)
+        prev = np.vstack([level, target[:-1]])
+        level = target[-1]
+
+        starts = lead + (first + np.arange(n, dtype=np.int64)) * period
+        out = []
+        for ch in range(8):
+            edges = starts[target[:, ch] != prev[:, ch]] + ch * step
+            toggles = [np.add.outer(edges, np.arange(2 * bounce + 1) * b_step).ravel()]
+            hit = rng.random(n) < glitch_rate
+            if hit.any():
+                g = starts[hit] + burst + rng.integers(width, period - burst - 2 * width, hit.sum())
+                toggles.append(np.c_[g, g + width].ravel())
+            out.append(np.sort(np.concatenate(toggles)))
+        yield out, lead + (first + n) * period
+
+
+def synthesize(payload: bytes, out_dir: Path, make_zip: bool = False, **opts) -> dict:
+    """Write digital.csv and capture.sal/ for payload -> stats (transitions, rows, expected hex)."""
+    rate = opts.get('rate', 2e6)
+    out_dir = Path(out_dir)
+    sal_dir = out_dir / 'capture.sal'
+    sal_dir.mkdir(parents=True, exist_ok=True)
+
+    row_text = [','.join(str((c >> i) & 1) for i in range(8)) for c in range(256)]
+    weights = (1 << np.arange(8)).astype(np.int64)
+    blank = np.ones(8, np.uint8) if opts.get('active_low', True) else np.r_[np.zeros(7, np.uint8), 1]
+    header = lambda num_chunks: FILE_HEADER.pack(MAGIC, 2, 100, 1, rate, 0, 0.0, 0, num_chunks)
+    bins = [open(sal_dir / f'digital-{ch}.bin', 'wb') for ch in range(8)]
+    for f in bins:
+        f.write(header(0))
+    chunks = [0] * 8
+    run_start = [0] * 8                                     # sample where each channel's open run began
+    run_state = blank.copy()                                # level of each open run
+    state = blank.copy()                                    # channel levels at the last CSV row
+    transitions = rows = end = 0
+
+    def write_chunk(ch, toggles):
+        """One chunk per channel per block: the open run plus every run closed by `toggles`."""
+        body = _encode_varints(np.diff(np.r_[run_start[ch], toggles]))
+        bins[ch].write(CHUNK_HEADER.pack(run_start[ch], int(toggles[-1]), int(run_state[ch]), 0, len(body)) + body)
+        chunks[ch] += 1
+
+    with open(out_dir / 'digital.csv', 'w', newline='') as csv_out:
+        csv_out.write('Time [s],' + ','.join(f'Channel {i}' for i in range(8)) + '\n')
+        csv_out.write(f'{0:.9f},{row_text[int(state @ weights)]}\n')
+        rows += 1
+        for toggles, end in iter_toggles(payload, **opts):
+            samples = merge_edges(toggles)
+            levels = np.empty((len(samples), 8), dtype=np.uint8)
+            for ch, tog in enumerate(toggles):
+                levels[:, ch] = state[ch] ^ (np.searchsorted(tog, samples, side='right') & 1)
+                if len(tog):
+                    write_chunk(ch, tog)
+                    run_state[ch] ^= len(tog) & 1
+                    run_start[ch] = int(tog[-1])
+                transitions += len(tog)
+            if len(levels):
+                state = levels[-1]
+            codes = levels.astype(np.int64) @ weights
+            csv_out.write(''.join(f'{t:.9f},{row_text[c]}\n' for t, c in zip(samples / rate, codes)))
+            rows += len(samples)
+        csv_out.write(f'{end / rate:.9f},{row_text[int(state @ weights)]}')
+        rows += 1
+
+    for ch, f in enumerate(bins):
+        if end > run_start[ch]:
+            write_chunk(ch, np.array([end]))
+        f.seek(0)
+        f.write(header(chunks[ch]))
+        f.close()
+
+    meta = {
+        'version': 19,
+        'data': {'legacySettings': {'sampleRate': {'digital': int(rate)},
+                                    'glitchFilter': {'enabled': False, 'channels': []}}},
+        'binData': [{'category': 'legacy', 'type': 'Digital', 'deviceChannel': ch, 'file': f'./digital-{ch}.bin'}
+                    for ch in range(8)],
+    }
+    (sal_dir / 'meta.json').write_text(json.dumps(meta))
+    if make_zip:
+        with zipfile.ZipFile(out_dir / 'capture.sal.zip', 'w', zipfile.ZIP_DEFLATED) as zf:
+            for p in sorted(sal_dir.iterdir()):
+                zf.write(p, p.name)
+
+    return {'transitions': transitions, 'rows': rows, 'digits': 2 * len(payload), 'hex': payload.hex()}
+
+
+def random_payload(n: int, seed: int = 0) -> bytes:
+    """n random printable ASCII bytes wrapped as flag{...}."""
+    rng = np.random.default_rng(seed)
+    body = rng.integers(0x21, 0x7f, max(0, n - 6), dtype=np.uint8).tobytes()
+    return b'flag{' + body + b'}'
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('out', help='Output directory')
+    p.add_argument('--payload', default='flag{hardware_capture_logic}', help='Text to encode')
+    p.add_argument('--random', type=int, help='Encode N random printable bytes instead of --payload')
+    p.add_argument('--rate', type=float, default=2e6, help='Sample rate (Hz); default=2e6')
+    p.add_argument('--hold', type=float, default=0.01, help='Seconds each digit is held; default=0.01')
+    p.add_argument('--edge-step', type=float, default=5e-6, help='Seconds between per-channel edges in a burst')
+    p.add_argument('--bounce', type=int, default=0, help='Extra toggle pairs per edge (contact bounce)')
+    p.add_argument('--bounce-step', type=float, default=5e-7, help='Seconds between bounce toggles')
+    p.add_argument('--glitch-rate', type=float, default=0.0, help='Chance per digit and channel of a glitch while held')
+    p.add_argument('--glitch-width', type=float, default=5e-7, help='Glitch pulse width (seconds)')
+    p.add_argument('--perm', default='0,1,2,3,4,5,6', help='Channel 0..6 -> segment a..g wiring (comma‑sep)')
+    p.add_argument('--active-high', action='store_true', help='Drive segments active‑high')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--zip', action='store_true', help='Also write capture.sal.zip')
+    args = p.parse_args()
+
+    payload = random_payload(args.random, args.seed) if args.random else args.payload.encode()
+    perm = tuple(int(x) for x in args.perm.split(','))
+    assert len(perm) == 7 and sorted(perm) == list(range(7)), 'perm must be a permutation of 0..6'
+    stats = synthesize(payload, Path(args.out), make_zip=args.zip, rate=args.rate, hold=args.hold,
+                       edge_step=args.edge_step, bounce=args.bounce, bounce_step=args.bounce_step,
+                       glitch_rate=args.glitch_rate, glitch_width=args.glitch_width, perm=perm,
+                       active_low=not args.active_high, seed=args.seed)
+    print(f"[*] {stats['digits']} digits, {stats['transitions']} transitions, {stats['rows']} CSV rows -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+from pathlib import Path
+
+import batch
+
+HERE = Path(__file__).resolve().parent
+
+def test_scan_skips_non_saleae_csv(tmp_path):
+    for name in ("digital.csv", "samples_rising_channel3.csv"):
+        (tmp_path / name).write_bytes((HERE / name).read_bytes())
+    assert batch.find_captures([str(tmp_path)]) == [tmp_path / "digital.csv"]
+    # Named explicitly, a file is still taken as given
+    assert batch.find_captures([str(tmp_path / "samples_rising_channel3.csv")]) == [tmp_path / "samples_rising_channel3.csv"]
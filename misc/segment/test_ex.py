@@ -0,0 +1,21 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import ex
+
+HERE = Path(__file__).resolve().parent
+CAPTURE = HERE / "digital.csv"
+
+def test_iter_last_states_matches_masks():
+    states = ex.read_csv_last_states(CAPTURE)
+    masks = ex.last_state_masks(CAPTURE)
+    assert len(states) == len(masks) > 0
+    assert [ex.seven_seg_mask_from_state(st) for st in states] == masks.tolist()
+    # decode_digits marks invalid digits with None, decode_masks with -1
+    assert ex.decode_digits(states) == [d if d >= 0 else None for d in ex.decode_masks(masks).tolist()]
+
+def test_ex_decodes_digital_csv():
+    out = subprocess.run([sys.executable, "ex.py", "digital.csv"], cwd=HERE,
+                         capture_output=True, text=True, check=True).stdout
+    assert "[+] FLAG = flag{" in out
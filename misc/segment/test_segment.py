@@ -0,0 +1,14 @@
+from pathlib import Path
+
+import segment
+
+HERE = Path(__file__).resolve().parent
+CAPTURE = HERE / "digital.csv"
+
+def test_auto_perm_picks_identity_wiring():
+    # 0,1,2,6,4,5,3 decodes to more printable ASCII but leaves bursts that are not glyphs
+    res = segment.try_decode(CAPTURE, None, tuple(range(7)), auto_perm=True)
+    best = res['perm_candidates'][0]
+    assert (best['perm'], best['active_low']) == (tuple(range(7)), True)
+    assert best['valid_share'] == 1.0
+    assert res['decoded_7seg'] == segment.try_decode(CAPTURE, None, tuple(range(7)))['decoded_7seg']
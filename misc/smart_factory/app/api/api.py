@@ -1,105 +1,272 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
-import datetime
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
+import math
+import time
+
+from api.history import RESOLUTIONS, bucket_start
+from core.calculator import CalcError
+from core.deps import get_calculator, get_history, get_hub, get_settings, get_state_store
+
+SSE_KEEPALIVE = 15  # 초, 프록시가 유휴 연결을 끊지 않도록 보내는 주석 라인 간격
+MAX_BATCH_ITEMS = 1000  # /api/production_batch 한 요청의 lines + targets 최대 개수
+MAX_TARGET_AMOUNT = 2**31 - 1  # production_target.target_amount 가 INT
 
 router = APIRouter(
     prefix='/api',
     tags=['api']
 )
 
-manufact_data = {
-    'paper' : {
-        '1-1': True,
-        '1-2': True,
-        '3-1': True,
-        '4-2': False,
-    },
-    'leather' : {
-        '2-1': True,
-        '3-2': False,
-        '4-1': True,
-    },
-    'pencil' : {
-        '2-2': True,
-        '5-1': True,
-        '5-2': False
-    }
-}
-
-material_production_targets = {
-    'paper': 1000,
-    'leather': 500,
-    'pencil': 200
-}
-
-summary_data = {
-    "total_produced_today": 1250,
-    "daily_target": sum(material_production_targets.values()),
-    "current_efficiency": 83.3,
-    "total_errors": 5,
-    "unresolved_errors": 2,
-    "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-}
-
-def filter(exp):
-    blacklist = ['os', "'", '"']
-
-    for char in blacklist:
-        if char in exp:
-            return False
-        
-    return True
+# 상태 버전은 state_store가 관리. ETag = epoch + 버전 (재시작/다른 worker와 섞이지 않도록.
+# shared backend는 epoch가 브로커 단위라 worker가 달라도 같은 ETag)
+# 미리 인코딩한 body는 app.state.encoded_bodies: endpoint -> (ETag, JSON body)
+
+def versioned_json(request: Request, key: str, epoch: str, version: int, build):
+    etag = f'"{epoch}-{key}-{version}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+
+    encoded_bodies = request.app.state.encoded_bodies
+    cached = encoded_bodies.get(key)
+    if cached is None or cached[0] != etag:
+        cached = (etag, JSONResponse(content=build()).body)
+        encoded_bodies[key] = cached
+    return Response(content=cached[1], media_type='application/json', headers=headers)
 
 @router.get('/manufact')
-def get_manufact_status():
-    return JSONResponse(content=manufact_data)
+async def get_manufact_status(request: Request, state_store=Depends(get_state_store)):
+    version, state = await state_store.snapshot()
+    return versioned_json(request, 'manufact', state_store.epoch, version, lambda: state["manufact_lines"])
 
 @router.get("/production_status")
-async def get_production_status():
-    summary_data["daily_target"] = sum(material_production_targets.values())
-    response_data = {
-        "manufact_lines": manufact_data,
-        "summary": summary_data,
-        "material_targets": material_production_targets
-    }
-    return JSONResponse(content=response_data)
+async def get_production_status(request: Request, state_store=Depends(get_state_store)):
+    version, state = await state_store.snapshot()
+    return versioned_json(request, 'production_status', state_store.epoch, version, lambda: state)
+
+@router.get("/production_stream")
+async def stream_production_status(state_store=Depends(get_state_store), production_hub=Depends(get_hub)):
+    # Server-Sent Events: 접속 시 snapshot 한 번, 이후 line / target 변경분만 push
+    async def events():
+        queue = production_hub.subscribe()
+        try:
+            _, state = await state_store.snapshot()
+            yield production_hub.encode('snapshot', state)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    chunk = b': keepalive\n\n'
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            production_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def line_error(state, item):
+    if not isinstance(item, dict):
+        return "Line not found or invalid data."
+    material, coordinate = item.get("material"), item.get("coordinate")
+    if isinstance(material, str) and isinstance(coordinate, str) \
+            and material in state["manufact_lines"] and coordinate in state["manufact_lines"][material]:
+        return None
+    return "Line not found or invalid data."
+
+def target_error(state, item):
+    if not isinstance(item, dict):
+        return "Invalid target amount."
+    material, new_target = item.get("material"), item.get("target_amount")
+    if not isinstance(material, str) or material not in state["material_targets"]:
+        return f"Material '{material}' not found."
+    if not (isinstance(new_target, (int, float)) and not isinstance(new_target, bool)
+            and math.isfinite(new_target) and 0 <= new_target <= MAX_TARGET_AMOUNT):
+        return "Invalid target amount."
+    return None
 
 @router.post("/line_control")
-def update_line_status(line_data: dict):
+async def update_line_status(line_data: dict, state_store=Depends(get_state_store), production_hub=Depends(get_hub)):
     material = line_data.get("material")
     coordinate = line_data.get("coordinate")
     enabled = line_data.get("enabled")
 
-    if material in manufact_data and coordinate in manufact_data[material]:
-        manufact_data[material][coordinate] = bool(enabled)
+    _, state = await state_store.snapshot()
+    error = line_error(state, line_data)
+    if error is None:
+        await state_store.apply(lines={(material, coordinate): bool(enabled)})
+        production_hub.publish('line', {"material": material, "coordinate": coordinate, "enabled": bool(enabled)})
         return {"status": "success", "message": "Line status updated."}
-    return {"status": "error", "message": "Line not found or invalid data."}, 404
+    return {"status": "error", "message": error}, 404
 
 @router.post("/set_target")
-def set_material_target(target_data: dict):
+async def set_material_target(target_data: dict, state_store=Depends(get_state_store), production_hub=Depends(get_hub)):
     material = target_data.get("material")
     new_target = target_data.get("target_amount")
 
-    if material not in material_production_targets:
-        return {"status": "error", "message": f"Material '{material}' not found."}, 400
-
-    if isinstance(new_target, (int, float)) and new_target >= 0:
-        material_production_targets[material] = int(new_target)
-        summary_data["daily_target"] = sum(material_production_targets.values())
+    _, state = await state_store.snapshot()
+    error = target_error(state, target_data)
+    if error is None:
+        _, state = await state_store.apply(targets={material: int(new_target)})
+        production_hub.publish('target', {
+            "material": material,
+            "target_amount": state["material_targets"][material],
+            "daily_target": state["summary"]["daily_target"]
+        })
         return {"status": "success", "message": f"Production target for {material} updated."}
-    return {"status": "error", "message": "Invalid target amount."}, 400
+    return {"status": "error", "message": error}, 400
 
-@router.post("/calculate")
-def calculate_expression(data: dict):
-    expression = data.get("expression")
-    if not expression:
-        return {"error": "No expression provided."}, 400
-    
-    if not filter(expression):
-        return {"error": "No hack!"}, 400
-    
+@router.post("/production_batch")
+async def update_production_batch(batch_data: dict, state_store=Depends(get_state_store), production_hub=Depends(get_hub)):
+    # {"lines": [{material, coordinate, enabled}, ...], "targets": [{material, target_amount}, ...]}
+    # 전부 검증한 뒤 하나라도 틀리면 아무것도 반영하지 않는다. 맞으면 한 번에 반영하고 버전 / SSE 이벤트도 한 번만
+    line_items = batch_data.get("lines") or []
+    target_items = batch_data.get("targets") or []
+    if not isinstance(line_items, list) or not isinstance(target_items, list) \
+            or not 0 < len(line_items) + len(target_items) <= MAX_BATCH_ITEMS:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": f"lines / targets must be lists with 1 to {MAX_BATCH_ITEMS} items in total."
+        })
+
+    _, state = await state_store.snapshot()
+    line_errors = [line_error(state, item) for item in line_items]
+    target_errors = [target_error(state, item) for item in target_items]
+    failed = sum(error is not None for error in line_errors + target_errors)
+
+    def results(errors):
+        return [
+            {"status": "error", "message": error} if error is not None
+            else {"status": "skipped", "message": "Batch rejected."} if failed
+            else {"status": "success"}
+            for error in errors
+        ]
+
+    if failed:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": f"{failed} invalid item(s), nothing was applied.",
+            "lines": results(line_errors),
+            "targets": results(target_errors)
+        })
+
+    # 같은 라인 / 자재가 여러 번 나오면 마지막 값
+    _, state = await state_store.apply(
+        lines={(item["material"], item["coordinate"]): bool(item.get("enabled")) for item in line_items},
+        targets={item["material"]: int(item["target_amount"]) for item in target_items}
+    )
+    production_hub.publish('snapshot', state)
+    return {
+        "status": "success",
+        "message": f"{len(line_items) + len(target_items)} update(s) applied.",
+        "lines": results(line_errors),
+        "targets": results(target_errors)
+    }
+
+def event_error(state, item):
+    if not isinstance(item, dict):
+        return "Invalid event."
+    material = item.get("material")
+    if not isinstance(material, str) or material not in state["material_targets"]:
+        return f"Material '{material}' not found."
+    for key in ("produced", "errors"):
+        value = item.get(key, 0)
+        if not (isinstance(value, int) and not isinstance(value, bool) and value >= 0):
+            return f"Invalid {key} count."
+    recorded_at = item.get("time")    # 없거나 null 이면 지금
+    if recorded_at is not None and not (isinstance(recorded_at, (int, float)) and not isinstance(recorded_at, bool)
+                                        and math.isfinite(recorded_at) and 0 <= recorded_at <= time.time() + 60):
+        return "Invalid time."
+    return None
+
+@router.post("/production_events")
+async def record_production_events(data: dict, state_store=Depends(get_state_store), production_history=Depends(get_history)):
+    # {"events": [{material, produced, errors, time(epoch 초, 없으면 지금)}, ...]} 또는 이벤트 하나
+    items = data.get("events", [data])
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_ITEMS:
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": f"events must be a list with 1 to {MAX_BATCH_ITEMS} items."
+        })
+
+    _, state = await state_store.snapshot()
+    errors = [event_error(state, item) for item in items]
+    if any(error is not None for error in errors):
+        return JSONResponse(status_code=400, content={
+            "status": "error",
+            "message": "Invalid event(s), nothing was recorded.",
+            "events": [{"status": "error", "message": error} if error is not None else {"status": "skipped"} for error in errors]
+        })
+
+    now = time.time()
+    production_history.record([
+        (float(item["time"] if item.get("time") is not None else now), item["material"], item.get("produced", 0), item.get("errors", 0))
+        for item in items
+    ])
+    return {"status": "success", "message": f"{len(items)} event(s) recorded."}
+
+@router.get("/production_events")
+def recent_production_events(limit: int = 100, production_history=Depends(get_history)):
+    # 메모리 ring buffer에 남아 있는 최근 원본 이벤트
+    limit = max(0, min(limit, MAX_BATCH_ITEMS))
+    return {"events": [
+        {"time": ts, "material": material, "produced": produced, "errors": errors}
+        for ts, material, produced, errors in production_history.recent(limit)
+    ]}
+
+@router.get("/production_history")
+async def get_production_history(
+    resolution: str = 'auto', start: float | None = None, end: float | None = None, material: str | None = None,
+    production_history=Depends(get_history), settings=Depends(get_settings)
+):
+    # [start, end) 구간의 bucket 합계. resolution=auto 면 bucket 수가 HISTORY_MAX_BUCKETS 이하인 가장 세밀한 단위
+    end = time.time() if end is None else end
+    start = end - 86400 if start is None else start
+    if not start < end:
+        return JSONResponse(status_code=400, content={"error": "start must be before end."})
+
+    if resolution == 'auto':
+        resolution = next(
+            (name for name, step in RESOLUTIONS.items() if (end - start) / step <= settings.HISTORY_MAX_BUCKETS), 'day'
+        )
+    if resolution not in RESOLUTIONS:
+        return JSONResponse(status_code=400, content={"error": f"resolution must be auto or one of {', '.join(RESOLUTIONS)}."})
+    step = RESOLUTIONS[resolution]
+    if (end - start) / step > settings.HISTORY_MAX_BUCKETS:
+        return JSONResponse(status_code=400, content={"error": f"Range too large for {resolution} buckets (max {settings.HISTORY_MAX_BUCKETS})."})
+
+    return {
+        "resolution": resolution,
+        "step": step,
+        "start": bucket_start(start, step),
+        "end": end,
+        "buckets": await production_history.query(resolution, start, end, material)
+    }
+
+def calculate_one(calculator, expression):
+    if not isinstance(expression, str) or not expression.strip():
+        return {"error": "No expression provided."}
     try:
-        result = eval(expression, {'__builtins__': None})
-        return {"result": str(result)}
-    except Exception as e:
-        return {"error": f"Invalid expression: {e}"}, 400
\ No newline at end of file
+        return {"result": str(calculator.evaluate(expression))}
+    except CalcError as e:
+        return {"error": f"Invalid expression: {e}"}
+
+@router.post("/calculate")
+def calculate_expression(data: dict, calculator=Depends(get_calculator), settings=Depends(get_settings)):
+    # {"expression": "..."} 하나, 또는 {"expressions": [...]} 여러 개를 한 번에 (결과는 같은 순서)
+    expressions = data.get("expressions")
+    if expressions is not None:
+        if not isinstance(expressions, list) or len(expressions) > settings.CALC_MAX_BATCH:
+            return JSONResponse(status_code=400, content={"error": f"expressions must be a list of at most {settings.CALC_MAX_BATCH} items."})
+        return {"results": [calculate_one(calculator, expression) for expression in expressions]}
+
+    result = calculate_one(calculator, data.get("expression"))
+    if "error" in result:
+        return JSONResponse(status_code=400, content=result)
+    return result
@@ -0,0 +1,97 @@
+import asyncio
+import fcntl
+import json
+import os
+
+# worker 간 상태 공유용 unix socket 프로토콜. 메시지는 한 줄에 JSON 하나
+#   broker -> worker : hello  {epoch, version, state}            연결 직후 한 번, 전체 상태
+#                      delta  {version, lines, targets, updated, origin}  모든 worker에 같은 순서로
+#                      result {id, version | error}              apply 요청한 worker에만, delta를 보낸 뒤
+#   worker -> broker : apply  {id, origin, lines: [[material, coordinate, enabled], ...], targets: {material: amount}}
+MESSAGE_LIMIT = 2 ** 20  # 한 메시지(줄) 최대 크기
+
+def encode(message) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+async def read_message(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError('state broker connection closed')
+    return json.loads(line)
+
+def try_lock(path: str):
+    # lock 파일을 잡으면 열린 파일을, 다른 프로세스가 잡고 있으면 None.
+    # lock은 프로세스가 죽으면 OS가 풀어 주므로, 브로커 worker가 죽으면 남은 worker 중 하나가 잡게 된다
+    lock_file = open(path + '.lock', 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+class StateBroker:
+    # lock을 잡은 worker 안에서 도는 브로커. 원본 상태(store)를 갖고 쓰기를 순서대로 검증 / 반영한 뒤 변경분을 뿌린다
+    def __init__(self, path: str, store, epoch: str):
+        self.path = path
+        self.store = store
+        self.epoch = epoch
+        self._server = None
+        self._clients = set()
+
+    async def start(self):
+        # 이전 브로커가 남긴 소켓 파일은 lock을 잡은 쪽이 지운다
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=MESSAGE_LIMIT)
+
+    async def close(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+        await self._server.wait_closed()
+        self._server = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    async def _handle(self, reader, writer):
+        version, state = await self.store.snapshot()
+        writer.write(encode({'type': 'hello', 'epoch': self.epoch, 'version': version, 'state': state}))
+        self._clients.add(writer)
+        try:
+            while True:
+                message = await read_message(reader)
+                if message.get('type') == 'apply':
+                    await self._apply(writer, message)
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _apply(self, writer, message):
+        lines = {(material, coordinate): enabled for material, coordinate, enabled in message['lines']}
+        try:
+            version, state = await self.store.apply(lines=lines, targets=message['targets'])
+        except KeyError as e:
+            writer.write(encode({'type': 'result', 'id': message['id'], 'error': str(e)}))
+            return
+
+        delta = encode({
+            'type': 'delta', 'version': version, 'origin': message.get('origin'),
+            'lines': message['lines'], 'targets': message['targets'], 'updated': state['summary']['last_updated']
+        })
+        for client in list(self._clients):
+            client.write(delta)
+        # 같은 연결에서 delta 다음에 result가 가므로, 요청한 worker는 result를 받을 때 이미 복제본에 반영돼 있다
+        writer.write(encode({'type': 'result', 'id': message['id'], 'version': version}))
+        await writer.drain()
@@ -0,0 +1,254 @@
+from bisect import bisect_left, insort
+from collections import deque
+import asyncio
+import threading
+import time
+
+from sqlalchemy import text
+
+from db import session as db_session
+
+# 생산 이력. 들어온 이벤트(시각, 자재, 생산량, 불량)는 최근 것만 ring buffer에 남기고,
+# 기록하는 순간 분 / 시 / 일 단위 bucket 합계에 더해 둔다. 조회는 bucket 합계만 읽으므로 몇 주 범위도 원본 이벤트를 훑지 않는다
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+def bucket_start(ts: float, step: int) -> int:
+    # 현지 시각 기준으로 자른다 (일 단위 bucket이 자정에서 시작하도록)
+    offset = time.localtime(ts).tm_gmtoff
+    return int(ts - (ts + offset) % step)
+
+class Rollup:
+    # 한 해상도의 bucket 합계. keys는 정렬된 bucket 시작 시각이라 범위 조회는 bisect 두 번
+    def __init__(self, step: int, retention: float):
+        self.step = step
+        self.retention = retention
+        self.keys = []
+        self.buckets = {}   # bucket 시작 -> {material: [produced, errors]}
+
+    def add(self, bucket: int, material: str, produced: int, errors: int):
+        totals = self.buckets.get(bucket)
+        if totals is None:
+            totals = self.buckets[bucket] = {}
+            if not self.keys or bucket > self.keys[-1]:
+                self.keys.append(bucket)
+            else:
+                insort(self.keys, bucket)
+        counts = totals.setdefault(material, [0, 0])
+        counts[0] += produced
+        counts[1] += errors
+
+    def prune(self, now: float):
+        # 보관 기간이 지난 bucket은 10% 이상 쌓였을 때 한꺼번에 버린다
+        cut = bisect_left(self.keys, now - self.retention)
+        if cut and cut * 10 >= len(self.keys):
+            for bucket in self.keys[:cut]:
+                del self.buckets[bucket]
+            del self.keys[:cut]
+
+    def range(self, start: float, end: float, material: str | None = None):
+        # [start, end) 에 걸친 bucket -> [produced, errors] (material 없으면 자재 합계)
+        result = {}
+        for bucket in self.keys[bisect_left(self.keys, bucket_start(start, self.step)):bisect_left(self.keys, end)]:
+            produced = errors = 0
+            for name, counts in self.buckets[bucket].items():
+                if material is None or name == material:
+                    produced += counts[0]
+                    errors += counts[1]
+            if produced or errors:
+                result[bucket] = [produced, errors]
+        return result
+
+class MemoryHistory:
+    backend = 'memory'
+
+    def __init__(self, raw_size: int, retention: dict):
+        self.events = deque(maxlen=raw_size)   # (시각, material, produced, errors)
+        self.retention = retention             # 해상도 이름 -> 보관 기간 (초)
+        self._lock = threading.Lock()
+        self._rollups = self._new_rollups()
+
+    def _new_rollups(self):
+        return {name: Rollup(step, self.retention[name]) for name, step in RESOLUTIONS.items()}
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def record(self, events):
+        # events: [(시각, material, produced, errors), ...]
+        now = time.time()
+        with self._lock:
+            self.events.extend(events)
+            for ts, material, produced, errors in events:
+                for rollup in self._rollups.values():
+                    rollup.add(bucket_start(ts, rollup.step), material, produced, errors)
+            for rollup in self._rollups.values():
+                rollup.prune(now)
+
+    def recent(self, limit: int):
+        with self._lock:
+            return list(self.events)[-limit:] if limit else []
+
+    async def query(self, resolution: str, start: float, end: float, material: str | None = None):
+        # -> [[bucket 시작, produced, errors], ...] 시간순, 값이 있는 bucket만
+        with self._lock:
+            buckets = self._rollups[resolution].range(start, end, material)
+        return [[bucket, *counts] for bucket, counts in sorted(buckets.items())]
+
+class MySQLHistory(MemoryHistory):
+    # bucket 합계는 DB(production_rollup)에 누적하고, 메모리의 rollup은 아직 DB에 안 쓴 증가분만 갖는다.
+    # worker 여러 개가 각자 더해도 합계는 UPSERT로 누적되므로, 조회는 DB + 자기 worker의 미반영분
+    backend = 'mysql'
+
+    def __init__(self, flush_interval: float, **kwargs):
+        super().__init__(**kwargs)
+        self.flush_interval = flush_interval
+        self._pending_events = []
+        # 조회(DB + 미반영분) 도중에 flush 가 commit 되면 같은 증가분이 두 번 세어지거나 빠질 수 있다.
+        # flush 는 증가분을 분리할 때와 끝날 때 generation 을 하나씩 올리고 (홀수 = 쓰는 중), 조회는 lock 없이 DB를 읽은 뒤
+        # generation 이 그대로일 때만 미반영분을 더한다 (바뀌었으면 다시). 조회끼리는 서로 기다리지 않는다
+        self._generation = 0
+        self._idle = asyncio.Event()    # 쓰는 중인 flush 가 없을 때 set
+        self._idle.set()
+        self._flush_lock = asyncio.Lock()   # flush 끼리 (flush loop 와 close)
+        self._dirty = asyncio.Event()
+        self._flusher = None
+        self._pruned = 0.0
+
+    async def start(self):
+        async with db_session.db_engine.begin() as conn:
+            await conn.execute(text(
+                'CREATE TABLE IF NOT EXISTS production_event ('
+                'recorded_at DOUBLE NOT NULL, material VARCHAR(32) NOT NULL, produced INT NOT NULL, errors INT NOT NULL)'
+            ))
+            await conn.execute(text(
+                'CREATE TABLE IF NOT EXISTS production_rollup ('
+                'resolution INT NOT NULL, bucket BIGINT NOT NULL, material VARCHAR(32) NOT NULL, '
+                'produced BIGINT NOT NULL, errors BIGINT NOT NULL, PRIMARY KEY (resolution, bucket, material))'
+            ))
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self._flush()
+
+    def record(self, events):
+        super().record(events)
+        self._pending_events.extend(events)
+        self._dirty.set()
+
+    async def query(self, resolution: str, start: float, end: float, material: str | None = None):
+        step = RESOLUTIONS[resolution]
+        sql = (
+            'SELECT bucket, SUM(produced), SUM(errors) FROM production_rollup '
+            'WHERE resolution = :step AND bucket >= :start AND bucket < :end'
+            + (' AND material = :material' if material is not None else '')
+            + ' GROUP BY bucket'
+        )
+        params = {'step': step, 'start': bucket_start(start, step), 'end': end, 'material': material}
+        while True:
+            await self._idle.wait()
+            generation = self._generation
+            if generation % 2:
+                continue
+            async with db_session.db_engine.connect() as conn:
+                rows = (await conn.execute(text(sql), params)).all()
+            with self._lock:
+                if self._generation == generation:
+                    pending = self._rollups[resolution].range(start, end, material)
+                    break
+
+        buckets = {int(bucket): [int(produced), int(errors)] for bucket, produced, errors in rows}
+        for bucket, (produced, errors) in pending.items():
+            counts = buckets.setdefault(bucket, [0, 0])
+            counts[0] += produced
+            counts[1] += errors
+        return [[bucket, *counts] for bucket, counts in sorted(buckets.items())]
+
+    async def _flush_loop(self):
+        while True:
+            await self._dirty.wait()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush()
+            except Exception as e:
+                print(f'생산 이력 저장 오류 : {e}')
+                await asyncio.sleep(1)
+
+    async def _flush(self):
+        async with self._flush_lock:
+            self._dirty.clear()
+            with self._lock:
+                events, self._pending_events = self._pending_events, []
+                rollups, self._rollups = self._rollups, self._new_rollups()
+                if not events:
+                    return
+                self._generation += 1
+                self._idle.clear()
+            try:
+                await self._write(events, rollups)
+            finally:
+                with self._lock:
+                    self._generation += 1
+                self._idle.set()
+
+    async def _write(self, events, rollups):
+        rows = [
+            {'step': rollup.step, 'bucket': bucket, 'material': material, 'produced': counts[0], 'errors': counts[1]}
+            for rollup in rollups.values()
+            for bucket, totals in rollup.buckets.items()
+            for material, counts in totals.items()
+        ]
+        try:
+            async with db_session.db_engine.begin() as conn:
+                if conn.dialect.name == 'mysql':
+                    upsert = 'ON DUPLICATE KEY UPDATE produced = produced + VALUES(produced), errors = errors + VALUES(errors)'
+                else:
+                    upsert = ('ON CONFLICT (resolution, bucket, material) DO UPDATE SET '
+                              'produced = produced + excluded.produced, errors = errors + excluded.errors')
+                await conn.execute(
+                    text('INSERT INTO production_event (recorded_at, material, produced, errors) VALUES (:ts, :material, :produced, :errors)'),
+                    [{'ts': ts, 'material': m, 'produced': p, 'errors': e} for ts, m, p, e in events]
+                )
+                await conn.execute(
+                    text('INSERT INTO production_rollup (resolution, bucket, material, produced, errors) '
+                         'VALUES (:step, :bucket, :material, :produced, :errors) ' + upsert),
+                    rows
+                )
+
+                # 보관 기간이 지난 bucket은 한 시간에 한 번 지운다 (원본 이벤트 테이블은 보관용이라 그대로 둔다)
+                now = time.time()
+                if now - self._pruned > 3600:
+                    for rollup in rollups.values():
+                        await conn.execute(
+                            text('DELETE FROM production_rollup WHERE resolution = :step AND bucket < :cutoff'),
+                            {'step': rollup.step, 'cutoff': now - rollup.retention}
+                        )
+                    self._pruned = now
+        except Exception:
+            # 실패한 증가분은 다시 대기열로
+            with self._lock:
+                self._pending_events = events + self._pending_events
+                for name, rollup in rollups.items():
+                    for bucket, totals in rollup.buckets.items():
+                        for material, counts in totals.items():
+                            self._rollups[name].add(bucket, material, *counts)
+            self._dirty.set()
+            raise
+
+def make_history(settings):
+    kwargs = {
+        'raw_size': settings.HISTORY_RAW_SIZE,
+        'retention': {
+            'minute': settings.HISTORY_MINUTE_RETENTION,
+            'hour': settings.HISTORY_HOUR_RETENTION,
+            'day': settings.HISTORY_DAY_RETENTION,
+        },
+    }
+    if settings.HISTORY_BACKEND == 'mysql':
+        return MySQLHistory(settings.HISTORY_FLUSH_INTERVAL, **kwargs)
+    return MemoryHistory(**kwargs)
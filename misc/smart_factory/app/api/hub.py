@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+class EventHub:
+    # 생산 현황 변경을 SSE 구독자들에게 fan-out. 이벤트는 한 번만 직렬화해서 모든 큐에 같은 bytes를 넣는다
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.last_id = 0
+        self._subscribers = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def encode(self, event: str, data) -> bytes:
+        return f'id: {self.last_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+    def publish(self, event: str, data):
+        self.last_id += 1
+        chunk = self.encode(event, data)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(chunk)
+            except asyncio.QueueFull:
+                # 너무 느린 구독자는 끊는다. 브라우저 EventSource가 재접속하면서 snapshot을 다시 받음
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
@@ -0,0 +1,442 @@
+import asyncio
+import datetime
+import os
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from api.broker import MESSAGE_LIMIT, StateBroker, encode, read_message, try_lock
+from db import session as db_session
+
+DEFAULT_LINES = {
+    'paper' : {
+        '1-1': True,
+        '1-2': True,
+        '3-1': True,
+        '4-2': False,
+    },
+    'leather' : {
+        '2-1': True,
+        '3-2': False,
+        '4-1': True,
+    },
+    'pencil' : {
+        '2-2': True,
+        '5-1': True,
+        '5-2': False
+    }
+}
+
+DEFAULT_TARGETS = {
+    'paper': 1000,
+    'leather': 500,
+    'pencil': 200
+}
+
+DEFAULT_SUMMARY = {
+    "total_produced_today": 1250,
+    "current_efficiency": 83.3,
+    "total_errors": 5,
+    "unresolved_errors": 2,
+}
+
+def _transient(e):
+    # DB 연결 / 가용성 문제라 나중에 다시 쓰면 되는 오류 (값 때문에 실패한 건 다시 써도 계속 실패)
+    return isinstance(e, (OperationalError, InterfaceError, OSError)) or getattr(e, 'connection_invalidated', False)
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+class MemoryStateStore:
+    # 라인 on/off 와 자재별 목표량. 쓰기는 lock 안에서 새 dict를 만들어 통째로 교체(copy-on-write)하므로
+    # 읽는 쪽은 lock 없이 받은 snapshot을 그대로 직렬화해도 된다 (snapshot은 수정하지 말 것)
+    backend = 'memory'
+
+    def __init__(self, lines=DEFAULT_LINES, targets=DEFAULT_TARGETS, summary=DEFAULT_SUMMARY):
+        self.on_reload = None   # 다른 프로세스의 변경을 다시 읽었을 때 호출 (state)
+        self.epoch = f'{os.getpid():x}-{int(time.time()):x}'   # version이 의미를 갖는 범위 (ETag에 같이 넣는다)
+        self._lock = threading.Lock()
+        self._current = (0, self._build(lines, targets, summary, _now()))   # (version, state)를 한 번에 교체
+
+    @staticmethod
+    def _build(lines, targets, summary, updated):
+        return {
+            "manufact_lines": {material: dict(coords) for material, coords in lines.items()},
+            "summary": {**summary, "daily_target": sum(targets.values()), "last_updated": updated},
+            "material_targets": dict(targets)
+        }
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    async def snapshot(self):
+        return self._current
+
+    def _replace(self, lines, targets, summary, updated):
+        with self._lock:
+            self._current = (self._current[0] + 1, self._build(lines, targets, summary, updated))
+            return self._current
+
+    @staticmethod
+    def _check(state, lines, targets):
+        # 없는 라인/자재는 KeyError
+        for material, coordinate in lines:
+            if coordinate not in state["manufact_lines"].get(material, {}):
+                raise KeyError(f'{material} {coordinate}')
+        for material in targets:
+            if material not in state["material_targets"]:
+                raise KeyError(material)
+
+    @staticmethod
+    def _derive(state, lines, targets, updated):
+        # 바뀐 자재의 dict만 새로 만들고 나머지는 이전 snapshot과 공유
+        new_lines = dict(state["manufact_lines"])
+        for (material, coordinate), enabled in lines.items():
+            if new_lines[material] is state["manufact_lines"][material]:
+                new_lines[material] = dict(new_lines[material])
+            new_lines[material][coordinate] = bool(enabled)
+        new_targets = {**state["material_targets"], **{m: int(v) for m, v in targets.items()}}
+        summary = {**state["summary"], "daily_target": sum(new_targets.values()), "last_updated": updated}
+        return {"manufact_lines": new_lines, "summary": summary, "material_targets": new_targets}
+
+    async def apply(self, lines=None, targets=None):
+        # lines: {(material, coordinate): bool}, targets: {material: int}
+        # 전부 검증한 뒤 한 번에 반영하고 버전은 한 번만 올린다. 없는 라인/자재는 KeyError
+        lines = lines or {}
+        targets = targets or {}
+        with self._lock:
+            version, state = self._current
+            self._check(state, lines, targets)
+            self._current = (version + 1, self._derive(state, lines, targets, _now()))
+            return self._current
+
+class MySQLStateStore(MemoryStateStore):
+    # 메모리 snapshot을 read-through 캐시로 쓰고, 쓰기는 모아서 한 트랜잭션으로 DB에 반영
+    # production_state.version 은 DB에 반영될 때마다 올라가므로, 다른 worker가 바꾼 값은 버전 비교로 감지해서 다시 읽는다.
+    # 버전 확인은 요청과 상관없이 poll_interval 마다 background task 에서 (요청이 없어도 SSE 구독자에게 전달되도록)
+    backend = 'mysql'
+
+    def __init__(self, flush_interval: float, poll_interval: float, **kwargs):
+        super().__init__(**kwargs)
+        self.flush_interval = flush_interval
+        self.poll_interval = poll_interval
+        self._db_version = None
+        self._pending_lines = {}
+        self._pending_targets = {}
+        self._dirty = asyncio.Event()
+        # 다시 읽기(버전 확인 -> reload)와 flush(대기열 분리 -> commit)를 서로 배타적으로. reload 가 commit 전에 DB를 읽으면
+        # 방금 분리한 쓰기가 빠진 snapshot이 되고, flush 끝의 버전 비교가 그걸 DB와 같다고 봐서 계속 남는다
+        self._sync_lock = asyncio.Lock()
+        self._flusher = None
+        self._watcher = None
+
+    async def start(self):
+        async with db_session.db_engine.begin() as conn:
+            await conn.execute(text(
+                'CREATE TABLE IF NOT EXISTS production_line ('
+                'material VARCHAR(32) NOT NULL, coordinate VARCHAR(16) NOT NULL, enabled BOOLEAN NOT NULL, '
+                'PRIMARY KEY (material, coordinate))'
+            ))
+            await conn.execute(text(
+                'CREATE TABLE IF NOT EXISTS production_target ('
+                'material VARCHAR(32) NOT NULL PRIMARY KEY, target_amount INT NOT NULL)'
+            ))
+            await conn.execute(text(
+                'CREATE TABLE IF NOT EXISTS production_state (id INT NOT NULL PRIMARY KEY, version BIGINT NOT NULL)'
+            ))
+
+            # 처음 뜨는 DB라면 기본값을 넣는다 (이미 있는 행은 건드리지 않음)
+            _, state = self._current
+            lines = {(r[0], r[1]) for r in await conn.execute(text('SELECT material, coordinate FROM production_line'))}
+            targets = {r[0] for r in await conn.execute(text('SELECT material FROM production_target'))}
+            missing_lines = [
+                {'material': material, 'coordinate': coordinate, 'enabled': enabled}
+                for material, coords in state["manufact_lines"].items()
+                for coordinate, enabled in coords.items()
+                if (material, coordinate) not in lines
+            ]
+            missing_targets = [
+                {'material': material, 'target_amount': amount}
+                for material, amount in state["material_targets"].items()
+                if material not in targets
+            ]
+            if missing_lines:
+                await conn.execute(text('INSERT INTO production_line (material, coordinate, enabled) VALUES (:material, :coordinate, :enabled)'), missing_lines)
+            if missing_targets:
+                await conn.execute(text('INSERT INTO production_target (material, target_amount) VALUES (:material, :target_amount)'), missing_targets)
+            if (await conn.execute(text('SELECT version FROM production_state WHERE id = 1'))).first() is None:
+                await conn.execute(text('INSERT INTO production_state (id, version) VALUES (1, 0)'))
+
+        await self._reload()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self._watcher = asyncio.create_task(self._watch_loop())
+
+    async def close(self):
+        for task in (self._watcher, self._flusher):
+            if task is not None:
+                task.cancel()
+        self._flusher = self._watcher = None
+        await self._flush()
+
+    async def apply(self, lines=None, targets=None):
+        result = await super().apply(lines, targets)
+        self._pending_lines.update({k: bool(v) for k, v in (lines or {}).items()})
+        self._pending_targets.update({m: int(v) for m, v in (targets or {}).items()})
+        self._dirty.set()
+        return result
+
+    def _has_pending(self):
+        return bool(self._pending_lines or self._pending_targets)
+
+    async def _watch_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            # 아직 DB에 안 쓴 변경이 있으면 flush 뒤에 확인
+            if self._has_pending():
+                continue
+            try:
+                await self._refresh()
+            except Exception as e:
+                # DB가 잠깐 안 되더라도 마지막 snapshot으로 응답하고 다음 주기에 다시
+                print(f'생산 상태 갱신 오류 : {e}')
+
+    async def _refresh(self):
+        async with self._sync_lock:
+            async with db_session.db_engine.connect() as conn:
+                version = (await conn.execute(text('SELECT version FROM production_state WHERE id = 1'))).scalar()
+            if version == self._db_version:
+                return
+            state = await self._reload()
+        if self.on_reload is not None:
+            self.on_reload(state)
+
+    async def _reload(self):
+        async with db_session.db_engine.connect() as conn:
+            version = (await conn.execute(text('SELECT version FROM production_state WHERE id = 1'))).scalar()
+            line_rows = (await conn.execute(text('SELECT material, coordinate, enabled FROM production_line'))).all()
+            target_rows = (await conn.execute(text('SELECT material, target_amount FROM production_target'))).all()
+
+        lines = {}
+        for material, coordinate, enabled in line_rows:
+            lines.setdefault(material, {})[coordinate] = bool(enabled)
+        targets = {material: int(amount) for material, amount in target_rows}
+        # 읽는 동안 들어온 (아직 DB에 안 쓴) 변경은 다음 flush 가 쓸 것이므로 그대로 유지
+        for (material, coordinate), enabled in self._pending_lines.items():
+            lines.setdefault(material, {})[coordinate] = enabled
+        targets.update(self._pending_targets)
+        _, state = self._current
+        summary = {k: v for k, v in state["summary"].items() if k not in ("daily_target", "last_updated")}
+
+        self._db_version = version
+        _, state = self._replace(lines, targets, summary, _now())
+        return state
+
+    async def _flush_loop(self):
+        while True:
+            await self._dirty.wait()
+            # flush_interval 동안 들어온 변경을 모아서 한 번에 쓴다
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush()
+            except Exception as e:
+                print(f'생산 상태 저장 오류 : {e}')
+                await asyncio.sleep(1)
+
+    async def _flush(self):
+        async with self._sync_lock:
+            await self._write_pending()
+
+    async def _write_pending(self):
+        self._dirty.clear()
+        lines, self._pending_lines = self._pending_lines, {}
+        targets, self._pending_targets = self._pending_targets, {}
+        if not lines and not targets:
+            return
+
+        try:
+            version = await self._write(lines, targets)
+        except Exception as e:
+            if _transient(e):
+                self._requeue(lines, targets)
+                raise
+            # 값 때문에 실패한 변경을 다시 대기열에 넣으면 매번 같이 실패해서 뒤의 쓰기까지 영영 못 나간다.
+            # 하나씩 다시 써서 실패하는 것만 버리고, 메모리 snapshot은 다음 확인 때 DB 기준으로 다시 읽는다
+            self._db_version = None
+            await self._write_each(lines, targets)
+            return
+
+        # 우리 쓰기 사이에 다른 worker가 쓴 게 없을 때만 현재 snapshot이 DB와 같다고 본다
+        if self._db_version is not None and version == self._db_version + 1:
+            self._db_version = version
+
+    async def _write(self, lines, targets):
+        async with db_session.db_engine.begin() as conn:
+            if lines:
+                await conn.execute(
+                    text('UPDATE production_line SET enabled = :enabled WHERE material = :material AND coordinate = :coordinate'),
+                    [{'material': m, 'coordinate': c, 'enabled': e} for (m, c), e in lines.items()]
+                )
+            if targets:
+                await conn.execute(
+                    text('UPDATE production_target SET target_amount = :target_amount WHERE material = :material'),
+                    [{'material': m, 'target_amount': v} for m, v in targets.items()]
+                )
+            await conn.execute(text('UPDATE production_state SET version = version + 1 WHERE id = 1'))
+            return (await conn.execute(text('SELECT version FROM production_state WHERE id = 1'))).scalar()
+
+    async def _write_each(self, lines, targets):
+        items = [({key: enabled}, {}) for key, enabled in lines.items()] \
+            + [({}, {material: amount}) for material, amount in targets.items()]
+        for i, (line, target) in enumerate(items):
+            try:
+                await self._write(line, target)
+            except Exception as e:
+                if _transient(e):
+                    for rest_line, rest_target in items[i:]:
+                        self._requeue(rest_line, rest_target)
+                    raise
+                print(f'생산 상태 저장 오류, 변경 버림 : {line or target} {e}')
+
+    def _requeue(self, lines, targets):
+        # 실패한 변경은 다시 대기열로 (그 사이 들어온 더 새로운 값이 우선)
+        self._pending_lines = {**lines, **self._pending_lines}
+        self._pending_targets = {**targets, **self._pending_targets}
+        self._dirty.set()
+
+class SharedStateStore(MemoryStateStore):
+    # uvicorn --workers N 용. lock 파일을 잡은 worker 하나가 unix socket 브로커(api/broker.py)를 띄워 원본 상태를 갖고,
+    # 모든 worker(브로커 worker 자신도)가 브로커에 연결해서 변경분을 받아 메모리 복제본에 순서대로 반영한다.
+    # 읽기는 복제본에서 바로, 쓰기는 브로커를 거쳐서 반영된 뒤에 응답하므로 자기가 쓴 값은 바로 다시 읽힌다
+    backend = 'shared'
+
+    def __init__(self, path: str, timeout: float, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.timeout = timeout
+        self._lock_file = None
+        self._broker = None
+        self._writer = None
+        self._connected = asyncio.Event()
+        self._pending = {}   # apply 요청 id -> Future
+        self._next_id = 0
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._connected.wait(), self.timeout)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._broker is not None:
+            await self._broker.close()
+            self._broker = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def apply(self, lines=None, targets=None):
+        lines = {k: bool(v) for k, v in (lines or {}).items()}
+        targets = {m: int(v) for m, v in (targets or {}).items()}
+        self._check(self._current[1], lines, targets)
+
+        await asyncio.wait_for(self._connected.wait(), self.timeout)
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(encode({
+                'type': 'apply', 'id': request_id, 'origin': os.getpid(),
+                'lines': [[material, coordinate, enabled] for (material, coordinate), enabled in lines.items()],
+                'targets': targets
+            }))
+            result = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if 'error' in result:
+            raise KeyError(result['error'])
+        return self._current
+
+    async def _run(self):
+        while True:
+            try:
+                await self._elect()
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MESSAGE_LIMIT)
+            except OSError:
+                # 브로커가 아직 안 떴거나 넘겨받는 중
+                await asyncio.sleep(0.1)
+                continue
+
+            try:
+                await self._follow(reader, writer)
+            except (ConnectionError, ValueError) as e:
+                # hello 전에 끊긴 건 죽어 가는 브로커에 붙었던 것 -> 조용히 다시 연결
+                if self._connected.is_set():
+                    print(f'상태 브로커 연결 끊김 : {e}')
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError('state broker connection lost'))
+
+    async def _elect(self):
+        if self._broker is not None:
+            return
+        self._lock_file = try_lock(self.path)
+        if self._lock_file is None:
+            return
+        # 새 브로커는 이 worker의 복제본(마지막으로 받은 변경분까지)에서 이어간다. epoch가 바뀌므로 다른 worker는 hello로 맞춘다
+        store = MemoryStateStore()
+        store._current = self._current
+        self._broker = StateBroker(self.path, store, store.epoch)
+        await self._broker.start()
+
+    async def _follow(self, reader, writer):
+        hello = await read_message(reader)
+        with self._lock:
+            self.epoch = hello['epoch']
+            self._current = (hello['version'], hello['state'])
+        self._writer = writer
+        self._connected.set()
+        if self.on_reload is not None:
+            self.on_reload(hello['state'])
+
+        while True:
+            message = await read_message(reader)
+            if message['type'] == 'delta':
+                lines = {(material, coordinate): enabled for material, coordinate, enabled in message['lines']}
+                with self._lock:
+                    _, state = self._current
+                    state = self._derive(state, lines, message['targets'], message['updated'])
+                    self._current = (message['version'], state)
+                # 이 worker가 쓴 변경은 요청 처리한 쪽에서 이미 이벤트를 보냈다
+                if message['origin'] != os.getpid() and self.on_reload is not None:
+                    self.on_reload(state)
+            elif message['type'] == 'result':
+                future = self._pending.get(message['id'])
+                if future is not None and not future.done():
+                    future.set_result(message)
+
+def make_state_store(settings):
+    if settings.STATE_BACKEND == 'mysql':
+        return MySQLStateStore(settings.STATE_FLUSH_INTERVAL, settings.STATE_POLL_INTERVAL)
+    if settings.STATE_BACKEND == 'shared':
+        return SharedStateStore(settings.STATE_SOCKET, settings.STATE_SOCKET_TIMEOUT)
+    return MemoryStateStore()
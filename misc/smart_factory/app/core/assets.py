@@ -0,0 +1,196 @@
+from hashlib import sha256
+from pathlib import Path
+import gzip
+import json
+import mimetypes
+import sys
+import threading
+import time
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from core import metrics
+
+# static/ 파일은 앱 시작(lifespan) 때 한 번 읽어서 내용 해시로 이름을 붙이고(css/index.3f2a9c01b7.css) gzip / brotli 로 미리 압축해 둔다.
+# 이미지 빌드 때 python -m core.assets 로 만들어 둔 압축본(PREBUILT_DIR)이 있으면 해시가 같은 파일은 그걸 그대로 쓴다.
+# 해시가 붙은 URL 은 내용이 바뀌면 URL 도 바뀌므로 1년 immutable 캐시, 원래 이름은 ETag 재검증.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+MIN_COMPRESS = 256  # 이보다 작은 본문은 압축하지 않음
+PREBUILT_DIR = 'static_build'
+
+class Encoded:
+    # 본문 하나와 미리 압축한 버전들
+    __slots__ = ('body', 'gzip', 'br', 'etag', 'media_type')
+
+    def __init__(self, body: bytes, media_type: str, compressed=None):
+        # compressed: 이미 압축해 둔 (gzip, br). 없으면 여기서 압축
+        self.body = body
+        self.media_type = media_type
+        self.etag = sha256(body).hexdigest()[:20]   # 따옴표 / 인코딩 표시 없는 해시 (encoded_response 에서 붙인다)
+        self.gzip = self.br = None
+        if compressed is not None:
+            self.gzip, self.br = compressed
+        elif len(body) >= MIN_COMPRESS:
+            compressed = gzip.compress(body, 9, mtime=0)
+            self.gzip = compressed if len(compressed) < len(body) else None
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                self.br = compressed if len(compressed) < len(body) else None
+
+def accepted_encodings(accept_encoding: str):
+    accepted = set()
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+def encoded_response(request_headers, entry: Encoded, cache_control: str, head: bool = False):
+    # 인코딩마다 바이트가 다르므로 strong ETag 도 다르게 ("<hash>", "<hash>-gzip", "<hash>-br")
+    body, encoding = entry.body, None
+    accepted = accepted_encodings(request_headers.get('accept-encoding', ''))
+    if entry.br is not None and 'br' in accepted:
+        body, encoding = entry.br, 'br'
+    elif entry.gzip is not None and 'gzip' in accepted:
+        body, encoding = entry.gzip, 'gzip'
+
+    etag = f'"{entry.etag}-{encoding}"' if encoding else f'"{entry.etag}"'
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if etag in [tag.strip() for tag in request_headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    response = Response(content=body, media_type=entry.media_type, headers=headers)
+    if head:
+        response.body = b''
+    return response
+
+def load_prebuilt(target: Path, body: bytes, media_type: str):
+    # write() 가 남긴 파일 (이름에 내용 해시가 있으므로 있으면 같은 내용). 없으면 None
+    if not target.is_file():
+        return None
+    compressed = [target.with_name(target.name + suffix) for suffix in ('.gz', '.br')]
+    return Encoded(body, media_type, tuple(p.read_bytes() if p.is_file() else None for p in compressed))
+
+def fingerprint(path: str, body: bytes) -> str:
+    name, dot, ext = path.rpartition('.')
+    digest = sha256(body).hexdigest()[:10]
+    return f'{name}.{digest}.{ext}' if dot else f'{path}.{digest}'
+
+class AssetFiles:
+    # StaticFiles 대신 mount 하는 ASGI 앱. 파일은 메모리에 올려 둔 것만 서빙하므로 디스크 접근이 없다.
+    # build 는 main.py 의 lifespan 에서 요청을 받기 전에 (요청 처리 중에는 읽거나 압축하지 않는다)
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.manifest = {}   # 원래 경로 -> 해시가 붙은 경로
+        self._files = {}     # 경로 (둘 다) -> (Encoded, Cache-Control)
+        self.built = False
+
+    def build(self, prebuilt=None):
+        prebuilt = Path(prebuilt) if prebuilt is not None else None
+        manifest, files = {}, {}
+        for file in sorted(p for p in self.directory.rglob('*') if p.is_file()):
+            path = file.relative_to(self.directory).as_posix()
+            body = file.read_bytes()
+            media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            if media_type.startswith('text/') or media_type in ('application/javascript', 'application/json'):
+                media_type += '; charset=utf-8'
+            manifest[path] = fingerprint(path, body)
+            entry = load_prebuilt(prebuilt / manifest[path], body, media_type) if prebuilt is not None else None
+            entry = entry or Encoded(body, media_type)
+            files[path] = (entry, REVALIDATE)
+            files[manifest[path]] = (entry, IMMUTABLE)
+        self.manifest, self._files, self.built = manifest, files, True
+
+    def url(self, path: str) -> str:
+        return '/static/' + self.manifest.get(path, path)
+
+    def write(self, out_dir):
+        # 빌드 결과를 디스크에도 남긴다 (앱 시작 때 build(prebuilt=...) 로 다시 쓰고, nginx / CDN 이 gzip_static / brotli_static 으로 바로 서빙할 수도 있게)
+        out_dir = Path(out_dir)
+        if not self.built:
+            self.build()
+        for path, hashed in self.manifest.items():
+            entry, _ = self._files[path]
+            target = out_dir / hashed
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(entry.body)
+            if entry.gzip is not None:
+                target.with_name(target.name + '.gz').write_bytes(entry.gzip)
+            if entry.br is not None:
+                target.with_name(target.name + '.br').write_bytes(entry.br)
+        (out_dir / 'manifest.json').write_text(json.dumps(self.manifest, indent=2))
+
+    async def __call__(self, scope, receive, send):
+        path = scope['path']
+        root = scope.get('root_path', '')
+        if path.startswith(root):
+            path = path[len(root):]
+
+        found = self._files.get(path.lstrip('/'))
+        if scope['method'] not in ('GET', 'HEAD'):
+            response = Response(status_code=405, headers={'Allow': 'GET, HEAD'})
+        elif found is None:
+            response = Response('Not Found', status_code=404, media_type='text/plain')
+        else:
+            headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+            response = encoded_response(headers, found[0], found[1], head=scope['method'] == 'HEAD')
+        await response(scope, receive, send)
+
+class RenderCache:
+    # 페이지마다 달라지는 건 login 여부와 에러 코드 -> 메시지 뿐이라, (템플릿, context) 별로 렌더 결과를 한 번만 만든다
+    def __init__(self, directory, globals=None, maxsize: int = 256):
+        self.directory = directory
+        self.globals = globals or {}
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._env = None
+        self._lock = threading.Lock()
+
+    @property
+    def env(self):
+        # jinja2 import 와 Environment 생성도 첫 렌더까지 미룬다
+        if self._env is None:
+            import jinja2
+            env = jinja2.Environment(loader=jinja2.FileSystemLoader(self.directory), autoescape=True)
+            env.globals.update(self.globals)
+            self._env = env
+        return self._env
+
+    def render(self, request, name: str, **context):
+        key = (name, tuple(sorted(context.items())))
+        entry = self._entries.get(key)
+        if entry is None:
+            start = time.perf_counter()
+            body = self.env.get_template(name).render(**context).encode()
+            metrics.TEMPLATE_RENDER.observe(time.perf_counter() - start, name)
+            entry = Encoded(body, 'text/html; charset=utf-8')
+            with self._lock:
+                if len(self._entries) >= self.maxsize:
+                    self._entries.clear()
+                self._entries[key] = entry
+                self.misses += 1
+        else:
+            self.hits += 1
+        return encoded_response(request.headers, entry, REVALIDATE)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+if __name__ == '__main__':
+    # 빌드 단계: python -m core.assets [출력 디렉터리]  (app/ 에서 실행)
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else PREBUILT_DIR
+    assets = AssetFiles('static')
+    assets.write(out_dir)
+    print(f'{len(assets.manifest)} assets -> {out_dir} (brotli: {"on" if brotli is not None else "off"})')
@@ -0,0 +1,85 @@
+from functools import lru_cache
+import ast
+import math
+import operator
+
+# 한 요청이 CPU/메모리를 오래 잡지 못하도록 하는 상한
+MAX_EXPRESSION_LENGTH = 256
+MAX_NODES = 64          # AST 노드 수
+MAX_INT_BITS = 512      # 피연산자/중간 결과 정수 크기
+MAX_EXPONENT = 128
+
+class CalcError(ValueError):
+    pass
+
+def _check(value):
+    if isinstance(value, complex):
+        raise CalcError('Complex result')
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise CalcError('Number too large')
+    if isinstance(value, float) and not math.isfinite(value):
+        raise CalcError('Result out of range')
+    return value
+
+def _mul(a, b):
+    # 결과를 만들기 전에 크기를 어림잡아 거른다
+    if isinstance(a, int) and isinstance(b, int) and a.bit_length() + b.bit_length() > MAX_INT_BITS + 1:
+        raise CalcError('Number too large')
+    return a * b
+
+def _pow(a, b):
+    if abs(b) > MAX_EXPONENT:
+        raise CalcError('Exponent too large')
+    if isinstance(a, int) and isinstance(b, int) and b > 0 and (a.bit_length() - 1) * b > MAX_INT_BITS:
+        raise CalcError('Number too large')
+    return a ** b
+
+_BINARY = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _pow,
+}
+
+_UNARY = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+def _build(node):
+    # 허용된 노드만 closure로 바꾼다. 나머지(이름, 호출, 속성, 문자열 ...)는 전부 거부
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = _check(node.value)
+        return lambda: value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        op, operand = _UNARY[type(node.op)], _build(node.operand)
+        return lambda: op(operand())
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op, left, right = _BINARY[type(node.op)], _build(node.left), _build(node.right)
+        return lambda: _check(op(left(), right()))
+    raise CalcError(f'Unsupported syntax: {type(node).__name__}')
+
+def compile_expression(expression: str):
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalcError('Expression too long')
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except (SyntaxError, ValueError) as e:
+        raise CalcError(f'Invalid syntax: {e.msg if isinstance(e, SyntaxError) else e}')
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise CalcError('Expression too complex')
+    return _build(tree.body)
+
+class Calculator:
+    # 같은 수식은 한 번만 파싱/검증 (수식 문자열이 key, 최근 cache_size 개)
+    def __init__(self, cache_size: int):
+        self.compile = lru_cache(maxsize=cache_size)(compile_expression)
+
+    def evaluate(self, expression: str):
+        try:
+            return self.compile(expression)()
+        except (ZeroDivisionError, OverflowError) as e:
+            raise CalcError(str(e))
@@ -8,6 +8,41 @@ class Settings(BaseSettings):
     DB_PASSWORD: str
     DB_NAME: str
 
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL: float = 300
+
+    STATE_BACKEND: str = 'memory'   # 'memory' | 'shared' (worker 여러 개, unix socket 브로커) | 'mysql' (worker 여러 개, DB에 저장)
+    STATE_FLUSH_INTERVAL: float = 0.05
+    STATE_POLL_INTERVAL: float = 1.0   # mysql backend 가 다른 worker 의 변경을 확인하는 주기 (초)
+    STATE_SOCKET: str = '/tmp/smart_factory_state.sock'
+    STATE_SOCKET_TIMEOUT: float = 5.0
+
+    CALC_CACHE_SIZE: int = 1024     # 컴파일해 둔 수식 수 (LRU)
+    CALC_MAX_BATCH: int = 256       # /api/calculate 한 요청의 expressions 최대 개수
+
+    HISTORY_BACKEND: str = 'memory' # 'memory' | 'mysql' (bucket 합계를 DB에 누적, worker 여러 개일 때)
+    HISTORY_RAW_SIZE: int = 100000  # 메모리에 남겨 두는 최근 원본 이벤트 수
+    HISTORY_MINUTE_RETENTION: float = 2 * 86400   # 해상도별 bucket 보관 기간 (초)
+    HISTORY_HOUR_RETENTION: float = 90 * 86400
+    HISTORY_DAY_RETENTION: float = 5 * 365 * 86400
+    HISTORY_MAX_BUCKETS: int = 720  # /api/production_history 한 응답의 최대 bucket 수
+    HISTORY_FLUSH_INTERVAL: float = 1.0
+
+    # IP 별 로그인 / 회원가입 시도 (초당, burst 까지 모아 둘 수 있음). 공장 단말은 NAT 하나 뒤에서 같은 IP 로 보이므로
+    # 교대 시간에 한 번에 몰리는 로그인(한 교대 인원 수)을 burst 가 받아야 한다. IP 는 uvicorn 이 준 client 주소
+    # (프록시 뒤라면 FORWARDED_ALLOW_IPS 에 프록시를 넣어야 X-Forwarded-For 의 주소로 잡힌다)
+    AUTH_IP_RATE: float = 20
+    AUTH_IP_BURST: float = 1000
+    AUTH_USER_RATE: float = 0.2     # 사용자명 별 로그인 실패 (초당)
+    AUTH_USER_BURST: float = 5
+    AUTH_DB_CONCURRENCY: int = 8    # 인증 쿼리가 동시에 쓰는 DB 커넥션 수 (DB_POOL_SIZE 보다 작게)
+    AUTH_LIMITER_SIZE: int = 100000 # 기억해 둘 IP / 사용자명 수 (LRU)
+
     class Config:
         env_file = '.env'
 
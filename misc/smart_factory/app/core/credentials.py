@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from hashlib import sha256
+import asyncio
+import hmac
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from core.security import make_user_token
+
+class TokenBucket:
+    # key(사용자명 / IP) 별 token bucket. 오래 안 쓰인 key 부터 버려서 메모리를 maxsize 로 묶는다.
+    # 로그인 / 회원가입 (async 라우트) 에서 event loop 스레드로만 쓰고 메서드 안에 await 가 없으니 lock 은 필요 없다
+    def __init__(self, rate: float, burst: float, maxsize: int):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()   # key -> (tokens, updated_at)
+
+    def _tokens(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def available(self, key) -> bool:
+        return self._tokens(key, time.monotonic()) >= 1
+
+    def consume(self, key) -> bool:
+        now = time.monotonic()
+        tokens = self._tokens(key, now)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed
+
+def hash_password(password: str) -> str:
+    return sha256(password.encode()).hexdigest()
+
+class CredentialService:
+    # 로그인 / 회원가입 DB 처리. IP 별 시도 횟수와 사용자별 실패 횟수를 제한하고,
+    # 인증 쿼리가 동시에 잡을 수 있는 커넥션 수를 AUTH_DB_CONCURRENCY 로 묶어서 페이지 요청용 커넥션을 남겨 둔다
+    def __init__(self, settings):
+        self.ip_limit = TokenBucket(settings.AUTH_IP_RATE, settings.AUTH_IP_BURST, settings.AUTH_LIMITER_SIZE)
+        self.user_limit = TokenBucket(settings.AUTH_USER_RATE, settings.AUTH_USER_BURST, settings.AUTH_LIMITER_SIZE)
+        self.db_slots = asyncio.Semaphore(settings.AUTH_DB_CONCURRENCY)
+
+    async def login(self, db, username: str, password: str, ip: str):
+        # -> ('ok', (user_id, token)) | ('rate_limited', None) | ('user_not_found', None) | ('invalid_password', None)
+        if not self.ip_limit.consume(ip) or not self.user_limit.available(username):
+            return 'rate_limited', None
+
+        async with self.db_slots:
+            user = (await db.execute(
+                text('SELECT id, userid, password FROM user WHERE userid = :username'),
+                {'username': username}
+            )).first()
+
+        if not user:
+            self.user_limit.consume(username)
+            return 'user_not_found', None
+        if not hmac.compare_digest(user[2], hash_password(password)):
+            self.user_limit.consume(username)
+            return 'invalid_password', None
+        return 'ok', (user[0], make_user_token(user[1], user[2]))
+
+    async def register(self, db, username: str, password: str, ip: str):
+        # 중복 확인 SELECT 없이 INSERT 한 번. userid UNIQUE 제약에 걸리면 이미 있는 사용자
+        # -> 'ok' | 'rate_limited' | 'user_exists' | 'internal_error'
+        if not self.ip_limit.consume(ip):
+            return 'rate_limited'
+
+        hashed = hash_password(password)
+        try:
+            async with self.db_slots:
+                await db.execute(
+                    text('INSERT INTO user (userid, password, token) VALUES (:userid, :password, :token)'),
+                    {'userid': username, 'password': hashed, 'token': make_user_token(username, hashed)}
+                )
+                await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return 'user_exists'
+        except Exception as e:
+            await db.rollback()
+            print(f'회원가입 오류 : {e}')
+            return 'internal_error'
+        return 'ok'
@@ -0,0 +1,24 @@
+from fastapi import Request
+
+# create_app 이 app.state 에 만들어 둔 객체들을 라우트에서 꺼내 쓰는 dependency (모듈 전역 singleton 없음)
+
+def get_settings(request: Request):
+    return request.app.state.settings
+
+def get_state_store(request: Request):
+    return request.app.state.state_store
+
+def get_history(request: Request):
+    return request.app.state.history
+
+def get_hub(request: Request):
+    return request.app.state.hub
+
+def get_calculator(request: Request):
+    return request.app.state.calculator
+
+def get_token_cache(request: Request):
+    return request.app.state.token_cache
+
+def get_credentials(request: Request):
+    return request.app.state.credentials
@@ -0,0 +1,195 @@
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+from sqlalchemy import event
+
+# Prometheus text format (0.0.4) 를 직접 만든다. observe 는 lock 한 번 + bisect 정도라 상시로 켜 둬도 된다
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, key)} {value}' for key, value in values]
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labelvalues -> [bucket 별 개수 (+Inf 포함), 합계]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def collect(self):
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        names = self.labelnames + ('le',)
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+class Callback:
+    # 다른 모듈이 이미 세고 있는 값 (token_cache 통계 등)을 scrape 시점에 읽는다
+    def __init__(self, name: str, help: str, fn, type='gauge'):
+        self.name = name
+        self.help = help
+        self.type = type
+        self._fn = fn
+
+    def collect(self):
+        return [f'{self.name} {self._fn()}']
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        # 같은 이름이 이미 있으면 교체 (create_app 을 여러 번 불러도 중복 출력되지 않게)
+        self._metrics = [m for m in self._metrics if m.name != metric.name] + [metric]
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, type='gauge'):
+        return self.register(Callback(name, help, fn, type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            try:
+                lines += metric.collect()
+            except Exception as e:
+                print(f'metrics 수집 오류 ({metric.name}) : {e}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+REQUESTS = registry.counter('http_requests_total', 'HTTP requests by route and status.', ('method', 'route', 'status'))
+REQUEST_LATENCY = registry.histogram('http_request_duration_seconds', 'Time until response headers are sent.', ('method', 'route'))
+REQUEST_DB_QUERIES = registry.histogram('http_request_db_queries', 'DB queries issued per request.', ('route',), COUNT_BUCKETS)
+REQUEST_DB_TIME = registry.histogram('http_request_db_seconds', 'DB time per request.', ('route',))
+DB_QUERY = registry.histogram('db_query_duration_seconds', 'DB query execution time by statement type.', ('statement',))
+TEMPLATE_RENDER = registry.histogram('template_render_seconds', 'Jinja2 template render time (render cache misses).', ('template',))
+
+# 요청 하나에서 나간 DB 쿼리 [개수, 시간]. 요청 밖(startup, 백그라운드 flush)에서는 None
+_request_db = ContextVar('request_db', default=None)
+
+def route_label(scope):
+    # 실제 경로 대신 route 템플릿을 써서 label 종류가 늘어나지 않게 한다 (/static 은 mount 경로)
+    route = scope.get('route')
+    if route is not None:
+        return route.path
+    return scope.get('root_path') or 'unmatched'
+
+class MetricsMiddleware:
+    # ASGI middleware. 응답 헤더가 나가는 시점까지를 지연시간으로 잰다 (SSE 스트림도 연결 시간만 잡힘)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        started = False
+
+        def record(status):
+            nonlocal started
+            started = True
+            route = route_label(scope)
+            REQUEST_LATENCY.observe(time.perf_counter() - start, scope['method'], route)
+            REQUESTS.inc(scope['method'], route, status)
+            REQUEST_DB_QUERIES.observe(db[0], route)
+            REQUEST_DB_TIME.observe(db[1], route)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                record(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # 처리 안 된 예외는 바깥의 ServerErrorMiddleware 가 500 으로 바꾸므로 여기서는 응답이 안 보인다
+            if not started:
+                record(500)
+            raise
+        finally:
+            _request_db.reset(token)
+
+def _statement_label(statement):
+    word = statement.lstrip().split(None, 1)
+    return word[0].upper() if word else 'EMPTY'
+
+def instrument_engine(engine):
+    # AsyncEngine 이면 내부의 sync engine 에 이벤트를 건다
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        DB_QUERY.observe(elapsed, _statement_label(statement))
+        db = _request_db.get()
+        if db is not None:
+            db[0] += 1
+            db[1] += elapsed
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def handle_error(context):
+        # 실패한 쿼리는 after_cursor_execute 가 불리지 않으므로 시작 시간을 여기서 버린다
+        if context.connection is not None and context.connection.info.get('query_start'):
+            context.connection.info['query_start'].pop()
@@ -0,0 +1,8 @@
+from hashlib import sha256
+import json
+
+def make_user_token(username: str, hashed_password: str) -> str:
+    # UserToken 쿠키 값: 사용자명 + 비밀번호 해시에서 결정적으로 유도
+    userdata = {'username': username, 'password': hashed_password}
+    userdata = json.dumps(userdata, sort_keys=True).encode()
+    return sha256(userdata).hexdigest()
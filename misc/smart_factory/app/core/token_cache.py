@@ -0,0 +1,56 @@
+from collections import OrderedDict
+import time
+
+class TokenCache:
+    # UserToken -> user id, LRU 순서 + TTL 만료. 쓰는 곳(check_user / 로그인 / 로그아웃 / metrics)이 전부 async 라
+    # event loop 스레드에서만 접근하고, 메서드 안에 await 가 없으니 lock 없이도 중간에 끼어들 수 없다
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # token -> (user_id, expires_at)
+        self._by_user = {}              # user_id -> token
+
+    def get(self, token: str):
+        entry = self._entries.get(token)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                self._remove(token)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, token: str, user_id: int):
+        old = self._by_user.get(user_id)
+        if old is not None and old != token:
+            self._remove(old)
+        self._entries[token] = (user_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(token)
+        self._by_user[user_id] = token
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, token: str):
+        self._remove(token)
+
+    def invalidate_user(self, user_id: int):
+        # 비밀번호 변경 / 사용자 삭제 시 호출
+        token = self._by_user.get(user_id)
+        if token is not None:
+            self._remove(token)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+
+    def stats(self):
+        return {'size': len(self._entries), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                'hits': self.hits, 'misses': self.misses}
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is not None and self._by_user.get(entry[0]) == token:
+            del self._by_user[entry[0]]
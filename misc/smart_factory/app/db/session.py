@@ -1,24 +1,61 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from core.config import get_setting
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from core.security import make_user_token
 import os
 
-settings = get_setting()
+def database_url():
+    # DB_URL 이 있으면 그대로 사용 (loadtest.py 의 SQLite 대체 DB 등), 없으면 MySQL
+    return os.getenv('DB_URL') or 'mysql+aiomysql://{}:{}@{}:{}/{}'.format(
+        os.getenv('DB_USER', 'root'),
+        os.getenv('DB_PASSWORD', 'root'),
+        os.getenv('DB_HOST', 'chall_db'),
+        os.getenv('DB_PORT', '3306'),
+        os.getenv('DB_NAME', 'mydb'),
+    )
 
-SQLALCHEMY_DATABASE_URL = 'mysql+pymysql://{}:{}@{}:{}/{}'.format(
-    os.getenv('DB_USER', 'root'),
-    os.getenv('DB_PASSWORD', 'root'),
-    os.getenv('DB_HOST', 'chall_db'),
-    os.getenv('DB_PORT', '3306'),
-    os.getenv('DB_NAME', 'mydb'),
-)
+# import 시점에는 엔진을 만들지 않는다. main.py 의 lifespan 에서 init_engine / dispose_engine
+db_engine = None
+SessionLocal = None # 동일한 구성을 가진 세션을 생성하는 factory
 
-db_engine = create_engine(SQLALCHEMY_DATABASE_URL) # SQLAlchemy 엔진 객체 생성
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine) # 동일한 구성을 가진 세션을 생성하는 factory
+def init_engine(settings, url: str | None = None):
+    global db_engine, SessionLocal
+    if db_engine is None:
+        # SQLAlchemy 비동기 엔진 객체 생성 (커넥션 풀 설정은 core/config.Settings)
+        db_engine = create_async_engine(
+            url or database_url(),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+        SessionLocal = async_sessionmaker(bind=db_engine, autoflush=False, expire_on_commit=False)
+    return db_engine
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def dispose_engine():
+    global db_engine, SessionLocal
+    if db_engine is not None:
+        await db_engine.dispose()
+    db_engine = SessionLocal = None
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+
+def _user_columns(conn):
+    return {c['name'] for c in inspect(conn).get_columns('user')}
+
+async def ensure_user_tokens():
+    # 기존 DB에 token 컬럼이 없으면 추가하고, 비어 있는 행의 토큰을 채운다 (최초 1회만 전체 스캔)
+    async with db_engine.begin() as conn:
+        columns = await conn.run_sync(_user_columns)
+        if 'token' not in columns:
+            await conn.execute(text('ALTER TABLE user ADD COLUMN token CHAR(64) NULL'))
+            await conn.execute(text('CREATE UNIQUE INDEX ix_user_token ON user (token)'))
+
+        users = (await conn.execute(text('SELECT id, userid, password FROM user WHERE token IS NULL'))).all()
+        if users:
+            await conn.execute(
+                text('UPDATE user SET token = :token WHERE id = :id'),
+                [{'id': user[0], 'token': make_user_token(user[1], user[2])} for user in users]
+            )
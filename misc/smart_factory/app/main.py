@@ -1,61 +1,83 @@
-from fastapi import FastAPI, Request, Response, Form, Depends, status, Cookie
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Request, Response, Form, Depends, status, Cookie
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import Annotated
-from hashlib import sha256
-import json
 
 from api.api import router
-from db.session import get_db
-
-def check_user(UserToken, db: Session):
-    query = text('SELECT id, userid, password FROM user')
-    users = db.execute(query).all()
-
-    for user in users:
-        userdata = {'username':user[1], 'password': user[2]}
-        userdata = json.dumps(userdata, sort_keys=True).encode()
-        hash_userdata = sha256(userdata).hexdigest()
-        
-        if hash_userdata == UserToken:
-            return True
-        
-    return False
-
-app = FastAPI()
-
-templates = Jinja2Templates(directory='templates')
-app.mount('/static', StaticFiles(directory='static'), name='static')
-
-app.include_router(router)
-
-@app.get('/', response_class=HTMLResponse)
-def main_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None, db: Session = Depends(get_db)):
-    return templates.TemplateResponse(
-        'index.html',
-        {'request': request, 'login': check_user(UserToken, db)}
+from api.history import make_history
+from api.hub import EventHub
+from api.state import make_state_store
+from core import metrics
+from core.assets import PREBUILT_DIR, AssetFiles, RenderCache
+from core.calculator import Calculator
+from core.config import Settings, get_setting
+from core.credentials import CredentialService
+from core.deps import get_credentials, get_token_cache
+from core.token_cache import TokenCache
+from db import session
+from db.session import get_db, ensure_user_tokens
+
+def client_ip(request: Request):
+    return request.client.host if request.client else ''
+
+async def check_user(request: Request, UserToken):
+    if not UserToken:
+        return False
+
+    token_cache = request.app.state.token_cache
+
+    # 캐시에 있으면 DB 세션을 열지 않는다
+    if token_cache.get(UserToken) is not None:
+        return True
+
+    # token 컬럼의 UNIQUE 인덱스로 한 행만 조회
+    query = text('SELECT id FROM user WHERE token = :token')
+    async with session.SessionLocal() as db:
+        user = (await db.execute(query, {'token': UserToken})).first()
+    if user is None:
+        return False
+
+    token_cache.set(UserToken, user[0])
+    return True
+
+# static 파일은 해시 이름 + 미리 압축, 페이지는 (템플릿, login, 메시지) 별로 렌더 결과를 캐시. 둘 다 처음 쓰일 때 만든다
+assets = AssetFiles('static')
+pages = RenderCache('templates', globals={'static_url': assets.url})
+
+metrics.registry.callback('render_cache_hits_total', 'Page renders served from the render cache.', lambda: pages.hits, 'counter')
+metrics.registry.callback('render_cache_misses_total', 'Page renders that executed a template.', lambda: pages.misses, 'counter')
+
+web = APIRouter()
+
+@web.get('/metrics', include_in_schema=False)
+async def metrics_page():
+    return PlainTextResponse(metrics.registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+@web.get('/', response_class=HTMLResponse)
+async def main_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None):
+    return pages.render(
+        request, 'index.html',
+        login=await check_user(request, UserToken)
     )
 
-@app.get('/product', response_class=HTMLResponse)
-def product_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None, db: Session = Depends(get_db)):
-    return templates.TemplateResponse(
-        'product.html',
-        {'request': request, 'login': check_user(UserToken, db)}
+@web.get('/product', response_class=HTMLResponse)
+async def product_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None):
+    return pages.render(
+        request, 'product.html',
+        login=await check_user(request, UserToken)
     )
 
-@app.get('/control', response_class=HTMLResponse)
-def control_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None, db: Session = Depends(get_db)):
-    return templates.TemplateResponse(
-        'control.html',
-        {'request': request, 'login': check_user(UserToken, db)}
+@web.get('/control', response_class=HTMLResponse)
+async def control_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None):
+    return pages.render(
+        request, 'control.html',
+        login=await check_user(request, UserToken)
     )
 
-@app.get('/login', response_class=HTMLResponse)
-def login_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None, db: Session = Depends(get_db)):
+@web.get('/login', response_class=HTMLResponse)
+async def login_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None):
     success_message = request.query_params.get("registered") == "success"
     error_message = None
 
@@ -63,33 +85,31 @@ def login_page(request: Request, UserToken: Annotated[str | None, Cookie()] = No
         error_message = "사용자명 또는 비밀번호를 다시 확인해주세요."
     elif request.query_params.get("error") == "invalid_password":
         error_message = "사용자명 또는 비밀번호를 다시 확인해주세요."
-    return templates.TemplateResponse(
-        'login.html',
-        {'request': request, 'success_message': success_message, 'error_message': error_message, 'login': check_user(UserToken, db)}
+    elif request.query_params.get("error") == "rate_limited":
+        error_message = "잠시 후 다시 시도해주세요."
+    return pages.render(
+        request, 'login.html',
+        success_message=success_message, error_message=error_message, login=await check_user(request, UserToken)
     )
 
-@app.post('/login')
-def exec_login(
+@web.post('/login')
+async def exec_login(
+    request: Request,
     username: Annotated[str, Form()],
     password: Annotated[str, Form()],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    credentials: CredentialService = Depends(get_credentials),
+    token_cache: TokenCache = Depends(get_token_cache)
 ):
     if (username == '' or username is None) or (password == '' or password is None):
         return RedirectResponse(url='/login', status_code=status.HTTP_302_FOUND)
-    
-    user_query = text('SELECT id, userid, password FROM user WHERE userid = :username')
-    user = db.execute(user_query, {'username': username}).first()
 
-    if not user:
-        return RedirectResponse(url='/login?error=user_not_found', status_code=status.HTTP_303_SEE_OTHER)
-    
-    hashed_pwd_db = user[2]
-    if not (hashed_pwd_db == sha256(password.encode()).hexdigest()):
-        return RedirectResponse(url='/login?error=invalid_password', status_code=status.HTTP_303_SEE_OTHER)
-    
-    userdata = {'username':user[1], 'password': hashed_pwd_db}
-    userdata = json.dumps(userdata, sort_keys=True).encode()
-    hash_userdata = sha256(userdata).hexdigest()
+    result, user = await credentials.login(db, username, password, client_ip(request))
+    if result != 'ok':
+        return RedirectResponse(url=f'/login?error={result}', status_code=status.HTTP_303_SEE_OTHER)
+
+    user_id, hash_userdata = user
+    token_cache.set(hash_userdata, user_id)
 
     response = RedirectResponse(url='/?login=success', status_code=status.HTTP_303_SEE_OTHER)
     response.set_cookie(
@@ -104,8 +124,8 @@ def exec_login(
     return response
 
 
-@app.get('/register', response_class=HTMLResponse)
-def login_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None, db: Session = Depends(get_db)):
+@web.get('/register', response_class=HTMLResponse)
+async def login_page(request: Request, UserToken: Annotated[str | None, Cookie()] = None):
     error_message = None
     if request.query_params.get("error") == "password_mismatch":
         error_message = "비밀번호와 확인용 비밀번호가 일치하지 않습니다."
@@ -115,53 +135,99 @@ def login_page(request: Request, UserToken: Annotated[str | None, Cookie()] = No
         error_message = "이미 존재하는 사용자명입니다."
     elif request.query_params.get("error") == "internal_error":
         error_message = "알 수 없는 오류가 발생했습니다. 다시 시도해주세요."
+    elif request.query_params.get("error") == "rate_limited":
+        error_message = "잠시 후 다시 시도해주세요."
 
-    return templates.TemplateResponse(
-        'register.html',
-        {'request': request, 'error_message': error_message, 'login': check_user(UserToken, db)}
+    return pages.render(
+        request, 'register.html',
+        error_message=error_message, login=await check_user(request, UserToken)
     )
 
-@app.post('/register')
-def exec_register(
+@web.post('/register')
+async def exec_register(
+    request: Request,
     username: Annotated[str, Form()],
     password: Annotated[str, Form()],
     confirm_password: Annotated[str, Form()],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    credentials: CredentialService = Depends(get_credentials)
 ):
     if (username == '' or username is None) or (password == '' or password is None) or (confirm_password == '' or confirm_password is None):
         return RedirectResponse(url='/register?error=none_value', status_code=status.HTTP_303_SEE_OTHER)
     
     if password != confirm_password:
         return RedirectResponse(url='/register?error=password_mismatch', status_code=status.HTTP_303_SEE_OTHER)
-    
-    check_user = text('SELECT userid FROM user WHERE userid = :username')
-    exists = db.execute(check_user, {"username": username}).first()
 
-    if exists:
-        return RedirectResponse(url='/register?error=user_exists', status_code=status.HTTP_303_SEE_OTHER)
-    
-    hashed_pwd = sha256(password.encode()).hexdigest()
-
-    insert_user = text('INSERT INTO user (userid, password) VALUES (:userid, :password)')
+    result = await credentials.register(db, username, password, client_ip(request))
+    if result != 'ok':
+        return RedirectResponse(url=f'/register?error={result}', status_code=status.HTTP_303_SEE_OTHER)
 
-    try:
-        db.execute(insert_user, {'userid': username, 'password': hashed_pwd})
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        return RedirectResponse(url='/register?error=user_exists', status_code=status.HTTP_303_SEE_OTHER)
-    except Exception as e:
-        db.rollback()
-        print(f'회원가입 오류 : {e}')
-        return RedirectResponse(url='/register?error=internal_error', status_code=status.HTTP_303_SEE_OTHER)
-    
     return RedirectResponse(url='/login?registered=success', status_code=status.HTTP_303_SEE_OTHER)
 
-@app.get('/logout')
-def logout_page():
+@web.get('/logout')
+async def logout_page(
+    UserToken: Annotated[str | None, Cookie()] = None,
+    token_cache: TokenCache = Depends(get_token_cache)
+):
+    if UserToken:
+        token_cache.invalidate(UserToken)
+
     response = RedirectResponse(url='/', status_code=status.HTTP_302_FOUND)
     response.delete_cookie(
         key='UserToken'
     )
 
-    return response
\ No newline at end of file
+    return response
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DB 엔진 / 상태 저장소 연결은 worker 가 실제로 뜰 때 (import 나 create_app 만으로는 연결하지 않음)
+    # static 파일 읽기 / 압축도 요청을 받기 전에 (이미지 빌드 때 만든 압축본이 있으면 그대로)
+    if not assets.built:
+        assets.build(prebuilt=PREBUILT_DIR)
+    engine = session.init_engine(app.state.settings)
+    metrics.instrument_engine(engine)
+    try:
+        await ensure_user_tokens()
+    except Exception as e:
+        print(f'토큰 컬럼 준비 오류 : {e}')
+    await app.state.state_store.start()
+    await app.state.history.start()
+    try:
+        yield
+    finally:
+        # 아직 DB에 쓰지 않은 라인/목표 변경과 생산 이력을 내보낸다
+        await app.state.history.close()
+        await app.state.state_store.close()
+        await session.dispose_engine()
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    # uvicorn --factory main:create_app. 설정은 여기서 처음 읽고, 설정에 따라 만드는 객체는 전부 app.state 에 둔다
+    settings = settings or get_setting()
+    app = FastAPI(lifespan=lifespan)
+    state = app.state
+    state.settings = settings
+    state.hub = EventHub()
+    state.state_store = make_state_store(settings)
+    state.history = make_history(settings)
+    state.calculator = Calculator(settings.CALC_CACHE_SIZE)
+    state.token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+    state.credentials = CredentialService(settings)
+    state.encoded_bodies = {}
+
+    # 다른 worker가 바꾼 상태를 다시 읽으면 구독자들에게 전체 snapshot을 보낸다
+    state.state_store.on_reload = lambda snapshot: state.hub.publish('snapshot', snapshot)
+
+    # 같은 이름은 교체되므로 마지막으로 만든 app 의 값이 보인다
+    metrics.registry.callback('token_cache_hits_total', 'UserToken cache hits.', lambda: state.token_cache.hits, 'counter')
+    metrics.registry.callback('token_cache_misses_total', 'UserToken cache misses.', lambda: state.token_cache.misses, 'counter')
+    metrics.registry.callback('token_cache_size', 'Cached UserTokens.', lambda: state.token_cache.stats()['size'])
+    metrics.registry.callback('production_state_version', 'Production state version.', lambda: state.state_store.version)
+    metrics.registry.callback('production_history_buffered_events', 'Raw production events kept in memory.', lambda: len(state.history.events))
+    metrics.registry.callback('production_stream_subscribers', 'Open production SSE streams.', lambda: state.hub.subscribers)
+
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.mount('/static', assets, name='static')
+    app.include_router(router)
+    app.include_router(web)
+    return app
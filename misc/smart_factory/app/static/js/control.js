@@ -12,32 +12,66 @@ function compareCoordinates(a, b) {
     return aCol - bCol;
 }
 
+let productionState = null;
+
 async function fetchProductionStatus() {
     try {
         const response = await fetch('/api/production_status');
         if (!response.ok) throw new Error('네트워크 응답 오류');
-        const data = await response.json();
+        renderProductionStatus(await response.json());
+    } catch (error) {
+        console.error('데이터 로드 실패:', error);
+    }
+}
+
+function renderProductionStatus(data) {
+    productionState = data;
+
+    if (document.getElementById('manufact-status')) {
+        updateManufactStatus(data.manufact_lines);
+    }
+    if (document.getElementById('summary-dashboard')) {
+        updateSummaryDashboard(data.summary);
+    }
+    if (document.getElementById('production-chart')) {
+        updateProductionChart(data.summary);
+    }
+
+    if (document.getElementById('line-toggles')) {
+        renderLineToggles(data.manufact_lines);
+    }
+    if (document.getElementById('material-target-settings')) {
+        renderMaterialTargetSettings(data.material_targets);
+    }
+}
+
+// 서버가 보내는 변경분(SSE)을 현재 상태에 반영. 연결이 끊기면 EventSource가 재접속하고 snapshot을 다시 받는다
+function subscribeProductionStream() {
+    const source = new EventSource('/api/production_stream');
 
+    source.addEventListener('snapshot', (event) => {
+        renderProductionStatus(JSON.parse(event.data));
+    });
+
+    source.addEventListener('line', (event) => {
+        if (!productionState) return;
+        const { material, coordinate, enabled } = JSON.parse(event.data);
+        productionState.manufact_lines[material][coordinate] = enabled;
         if (document.getElementById('manufact-status')) {
-            updateManufactStatus(data.manufact_lines);
-        }
-        if (document.getElementById('summary-dashboard')) {
-            updateSummaryDashboard(data.summary);
-        }
-        if (document.getElementById('production-chart')) {
-            updateProductionChart(data.summary);
+            updateManufactStatus(productionState.manufact_lines);
         }
-
         if (document.getElementById('line-toggles')) {
-            renderLineToggles(data.manufact_lines);
-        }
-        if (document.getElementById('material-target-settings')) {
-            renderMaterialTargetSettings(data.material_targets);
+            renderLineToggles(productionState.manufact_lines);
         }
+    });
 
-    } catch (error) {
-        console.error('데이터 로드 실패:', error);
-    }
+    source.addEventListener('target', (event) => {
+        if (!productionState) return;
+        const { material, target_amount, daily_target } = JSON.parse(event.data);
+        productionState.material_targets[material] = target_amount;
+        productionState.summary.daily_target = daily_target;
+        renderProductionStatus(productionState);
+    });
 }
 
 function updateSummaryDashboard(summary) {
@@ -209,25 +243,45 @@ function renderLineToggles(manufact_lines) {
     });
 }
 
-async function updateLineStatusOnServer(material, coordinate, enabled) {
+// 짧은 시간 안에 바꾼 토글들은 모아서 /api/production_batch 한 번으로 보낸다
+const LINE_BATCH_DELAY = 300; // ms
+const pendingLineUpdates = new Map();
+let lineBatchTimer = null;
+
+function updateLineStatusOnServer(material, coordinate, enabled) {
+    pendingLineUpdates.set(`${material} ${coordinate}`, { material, coordinate, enabled });
+    clearTimeout(lineBatchTimer);
+    lineBatchTimer = setTimeout(flushLineUpdates, LINE_BATCH_DELAY);
+}
+
+async function flushLineUpdates() {
+    const lines = Array.from(pendingLineUpdates.values());
+    pendingLineUpdates.clear();
+    if (lines.length === 0) return;
+
     try {
-        const response = await fetch('/api/line_control', {
+        const response = await fetch('/api/production_batch', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ material, coordinate, enabled }),
+            body: JSON.stringify({ lines }),
         });
         const data = await response.json();
         if (data.status === 'success') {
-            console.log(`Line ${material} ${coordinate} status updated to ${enabled}.`);
+            console.log(`${lines.length} line status update(s) applied.`);
         } else {
+            const failed = (data.lines || [])
+                .map((result, i) => result.status === 'error' ? `${lines[i].material} ${lines[i].coordinate}: ${result.message}` : null)
+                .filter(Boolean);
             console.error(`Failed to update line status: ${data.message}`);
-            alert(`Failed to update line ${material} ${coordinate} status: ${data.message}`);
+            alert(`Failed to update line status: ${failed.join(', ') || data.message}`);
+            fetchProductionStatus();
         }
     } catch (error) {
         console.error('Error updating line status:', error);
         alert('Network error during line status update.');
+        fetchProductionStatus();
     }
 }
 
@@ -372,5 +426,9 @@ if (calculator) {
     });
 }
 
-fetchProductionStatus();
-setInterval(fetchProductionStatus, 5000);
\ No newline at end of file
+if (window.EventSource) {
+    subscribeProductionStream();
+} else {
+    fetchProductionStatus();
+    setInterval(fetchProductionStatus, 5000);
+}
\ No newline at end of file
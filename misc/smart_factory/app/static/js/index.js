@@ -10,6 +10,8 @@ function compareCoordinates(a, b) {
     return aCol - bCol;
 }
 
+let manufactState = null;
+
 async function fetchManufactStatus() {
     try {
         const response = await fetch('/api/manufact');
@@ -21,6 +23,23 @@ async function fetchManufactStatus() {
     }
 }
 
+// 라인 상태 변경분만 SSE로 받아 반영 (목표량 변경은 이 페이지와 무관)
+function subscribeManufactStream() {
+    const source = new EventSource('/api/production_stream');
+
+    source.addEventListener('snapshot', (event) => {
+        manufactState = JSON.parse(event.data).manufact_lines;
+        updateManufactStatus(manufactState);
+    });
+
+    source.addEventListener('line', (event) => {
+        if (!manufactState) return;
+        const { material, coordinate, enabled } = JSON.parse(event.data);
+        manufactState[material][coordinate] = enabled;
+        updateManufactStatus(manufactState);
+    });
+}
+
 function updateManufactStatus(data) {
     const container = document.getElementById('manufact-status');
     container.innerHTML = '';
@@ -87,5 +106,9 @@ function createLineStatusDiv(line) {
     return div;
 }
 
-fetchManufactStatus();
-setInterval(fetchManufactStatus, 5000);
\ No newline at end of file
+if (window.EventSource) {
+    subscribeManufactStream();
+} else {
+    fetchManufactStatus();
+    setInterval(fetchManufactStatus, 5000);
+}
\ No newline at end of file
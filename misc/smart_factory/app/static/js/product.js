@@ -12,21 +12,48 @@ function compareCoordinates(a, b) {
     return aCol - bCol;
 }
 
+let productionState = null;
+
 async function fetchProductionStatus() {
     try {
         const response = await fetch('/api/production_status');
         if (!response.ok) throw new Error('네트워크 응답 오류');
-        const data = await response.json();
+        renderProductionStatus(await response.json());
+    } catch (error) {
+        console.error('데이터 로드 실패:', error);
+    }
+}
 
-        updateManufactStatus(data.manufact_lines);
+function renderProductionStatus(data) {
+    productionState = data;
 
-        updateSummaryDashboard(data.summary);
+    updateManufactStatus(data.manufact_lines);
 
-        updateProductionChart(data.summary);
+    updateSummaryDashboard(data.summary);
+}
 
-    } catch (error) {
-        console.error('데이터 로드 실패:', error);
-    }
+// 서버가 보내는 변경분(SSE)을 현재 상태에 반영. 연결이 끊기면 EventSource가 재접속하고 snapshot을 다시 받는다
+function subscribeProductionStream() {
+    const source = new EventSource('/api/production_stream');
+
+    source.addEventListener('snapshot', (event) => {
+        renderProductionStatus(JSON.parse(event.data));
+    });
+
+    source.addEventListener('line', (event) => {
+        if (!productionState) return;
+        const { material, coordinate, enabled } = JSON.parse(event.data);
+        productionState.manufact_lines[material][coordinate] = enabled;
+        updateManufactStatus(productionState.manufact_lines);
+    });
+
+    source.addEventListener('target', (event) => {
+        if (!productionState) return;
+        const { material, target_amount, daily_target } = JSON.parse(event.data);
+        productionState.material_targets[material] = target_amount;
+        productionState.summary.daily_target = daily_target;
+        updateSummaryDashboard(productionState.summary);
+    });
 }
 
 function updateSummaryDashboard(summary) {
@@ -109,22 +136,56 @@ function createLineStatusDiv(line) {
     return div;
 }
 
-function updateProductionChart(summary) {
+let historyRange = 86400;
+const HISTORY_REFRESH = 30000;
+
+// 서버가 미리 합계를 내 둔 bucket만 받아서 그린다 (범위가 길수록 bucket 단위가 커짐)
+async function fetchProductionHistory() {
+    try {
+        const response = await fetch(`/api/production_history?start=${Date.now() / 1000 - historyRange}`);
+        if (!response.ok) throw new Error('네트워크 응답 오류');
+        updateProductionChart(await response.json());
+    } catch (error) {
+        console.error('생산 이력 로드 실패:', error);
+    }
+}
+
+function formatBucket(seconds, resolution) {
+    const date = new Date(seconds * 1000);
+    const pad = (n) => String(n).padStart(2, '0');
+    const day = `${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+    if (resolution === 'day') return `${date.getFullYear()}-${day}`;
+    return `${day} ${pad(date.getHours())}:${pad(date.getMinutes())}`;
+}
+
+function updateProductionChart(history) {
     const ctx = document.getElementById('production-chart').getContext('2d');
 
+    // 값이 없는 bucket은 응답에 빠져 있으므로 0으로 채운다
+    const counts = new Map(history.buckets.map(([time, produced, errors]) => [time, [produced, errors]]));
+    const labels = [];
+    const produced = [];
+    const errors = [];
+    for (let time = history.start; time < history.end; time += history.step) {
+        const [p, e] = counts.get(time) || [0, 0];
+        labels.push(formatBucket(time, history.resolution));
+        produced.push(p);
+        errors.push(e);
+    }
+
     const chartData = {
-        labels: ['생산량', '목표량'],
+        labels,
         datasets: [{
-            label: '오늘의 생산 목표 달성 현황',
-            data: [summary.total_produced_today, summary.daily_target],
-            backgroundColor: [
-                'rgba(40, 167, 69, 0.6)', 
-                'rgba(0, 123, 255, 0.6)' 
-            ],
-            borderColor: [
-                'rgba(40, 167, 69, 1)',
-                'rgba(0, 123, 255, 1)'
-            ],
+            label: '생산량',
+            data: produced,
+            backgroundColor: 'rgba(40, 167, 69, 0.6)',
+            borderColor: 'rgba(40, 167, 69, 1)',
+            borderWidth: 1
+        }, {
+            label: '불량',
+            data: errors,
+            backgroundColor: 'rgba(220, 53, 69, 0.6)',
+            borderColor: 'rgba(220, 53, 69, 1)',
             borderWidth: 1
         }]
     };
@@ -132,6 +193,7 @@ function updateProductionChart(summary) {
     const chartOptions = {
         responsive: true,
         maintainAspectRatio: false,
+        animation: false,
         scales: {
             y: {
                 beginAtZero: true,
@@ -155,5 +217,22 @@ function updateProductionChart(summary) {
     }
 }
 
-fetchProductionStatus();
-setInterval(fetchProductionStatus, 5000);
\ No newline at end of file
+document.querySelectorAll('.chart-range button').forEach(button => {
+    button.addEventListener('click', () => {
+        document.querySelectorAll('.chart-range button').forEach(b => b.classList.remove('active'));
+        button.classList.add('active');
+        historyRange = Number(button.dataset.range);
+        fetchProductionHistory();
+    });
+});
+
+// chart.js 가 이 파일 뒤에 로드되므로 load 이후에 첫 차트를 그린다
+window.addEventListener('load', fetchProductionHistory);
+setInterval(fetchProductionHistory, HISTORY_REFRESH);
+
+if (window.EventSource) {
+    subscribeProductionStream();
+} else {
+    fetchProductionStatus();
+    setInterval(fetchProductionStatus, 5000);
+}
\ No newline at end of file
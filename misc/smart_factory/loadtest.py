@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# smart_factory 부하 테스트
+#
+# mysql/init.sql 스키마로 SQLite 대체 DB를 만들고 사용자 N명을 넣은 뒤, 그 DB로 uvicorn(app/main.py)을 띄운다.
+# 가상 사용자(asyncio 클라이언트)들이 로그인 -> 페이지 렌더 / 생산 현황 polling 을 섞어서 보내고,
+# route 별 p50 / p99 지연시간과 초당 요청 수를 출력한다. --json 으로 저장해 두면 변경 전후를 비교할 수 있다.
+# 로그인 제한(AUTH_*)은 앱 설정 그대로다. 가상 사용자는 X-Forwarded-For 로 각자 client IP 를 갖고,
+# --client-ips 1 이면 전부 NAT 하나 뒤에서 로그인하는 것처럼 IP 하나를 나눠 쓴다 (rate limit 에 걸린 로그인은 errors)
+#
+# 사용법:
+#     python loadtest.py [--users 1000] [--clients 50] [--duration 10] [--client-ips 0] [--workers 1] [--state-backend memory] [--json result.json]
+#     python loadtest.py --url http://127.0.0.1:8888 --users 0   # 이미 떠 있는 서버(MySQL)에 그대로 부하
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from hashlib import sha256
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+ROOT = Path(__file__).resolve().parent
+APP_DIR = ROOT / 'app'
+sys.path.insert(0, str(APP_DIR))
+
+from core.security import make_user_token
+
+PAGES = ('/', '/product', '/control')
+
+def user_credentials(i):
+    return f'loaduser{i}', f'password{i}'
+
+def build_db(path: Path, users: int):
+    # MySQL 전용 구문만 SQLite 에 맞게 바꿔서 init.sql 을 그대로 실행
+    sql = (ROOT / 'mysql' / 'init.sql').read_text()
+    sql = re.sub(r'\bint\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', sql, flags=re.I)
+    conn = sqlite3.connect(path)
+    with conn:
+        for statement in sql.split(';'):
+            statement = statement.strip()
+            if statement and not re.match(r'(CREATE\s+DATABASE|USE)\b', statement, re.I):
+                conn.execute(statement)
+
+        rows = []
+        for i in range(users):
+            username, password = user_credentials(i)
+            hashed = sha256(password.encode()).hexdigest()
+            rows.append((username, hashed, make_user_token(username, hashed)))
+        conn.executemany('INSERT INTO user (userid, password, token) VALUES (?, ?, ?)', rows)
+    conn.close()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(db_path: Path, port: int, workers: int, state_backend: str, python: str = sys.executable):
+    env = dict(os.environ)
+    env.update({'DB_URL': f'sqlite+aiosqlite:///{db_path}', 'STATE_BACKEND': state_backend, 'STATE_SOCKET': f'{db_path}.sock'})
+    for key, value in (('DB_HOST', 'sqlite'), ('DB_PORT', '0'), ('DB_USER', 'loadtest'), ('DB_PASSWORD', 'loadtest'), ('DB_NAME', 'loadtest')):
+        env.setdefault(key, value)
+    return subprocess.Popen(
+        [python, '-m', 'uvicorn', 'main:create_app', '--factory', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning', '--no-access-log',
+         # 가상 사용자의 client IP 는 X-Forwarded-For 로 (앞에 프록시가 있는 것처럼). 로그인 제한은 설정 그대로
+         '--forwarded-allow-ips', '127.0.0.1'],
+        cwd=APP_DIR, env=env
+    )
+
+class HttpClient:
+    # keep-alive 연결 하나로 요청을 순서대로 보내는 최소한의 HTTP/1.1 클라이언트 (의존성 없이 오버헤드를 작게)
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self._reader = None
+        self._writer = None
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, headers=None, body: bytes = b''):
+        for attempt in (0, 1):
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await self._send(method, path, headers or {}, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # 서버가 유휴 연결을 닫았으면 한 번만 다시 연결
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _send(self, method, path, headers, body):
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        lines += [f'{k}: {v}' for k, v in headers.items()]
+        self._writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+        await self._writer.drain()
+
+        status = int((await self._reader.readuntil(b'\r\n')).split()[1])
+        response_headers = {}
+        while (line := await self._reader.readuntil(b'\r\n')) != b'\r\n':
+            key, _, value = line.decode('latin-1').partition(':')
+            key, value = key.strip().lower(), value.strip()
+            if key == 'set-cookie':
+                name, _, rest = value.partition('=')
+                self.cookies[name] = rest.split(';', 1)[0].strip('"')
+            response_headers[key] = value
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while size := int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16):
+                chunks.append(await self._reader.readexactly(size + 2))
+            await self._reader.readuntil(b'\r\n')
+            content = b''.join(c[:-2] for c in chunks)
+        else:
+            content = await self._reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection') == 'close':
+            await self.close()
+        return status, response_headers, content
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def timed(self, route, expected, request, ok=None):
+        # ok(headers): 상태 코드만으로 성공을 알 수 없는 응답 (예: 로그인 실패도 303 redirect)
+        start = time.perf_counter()
+        try:
+            status, headers, content = await request
+        except Exception:
+            status, headers, content = None, {}, b''
+        self.latencies.setdefault(route, []).append(time.perf_counter() - start)
+        if status not in expected or (ok is not None and not ok(headers)):
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return status, headers, content
+
+def client_ip(i):
+    return f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}'
+
+async def login(client: HttpClient, recorder: Recorder, users: int, ip: str):
+    username, password = user_credentials(random.randrange(users)) if users else ('admin', 'admin')
+    body = urlencode({'username': username, 'password': password}).encode()
+    # 실패(잘못된 비밀번호 / rate limit)도 303 이라 redirect 위치로 구분한다
+    await recorder.timed('POST /login', (303,), client.request(
+        'POST', '/login', {'Content-Type': 'application/x-www-form-urlencoded', 'X-Forwarded-For': ip}, body
+    ), ok=lambda headers: 'error=' not in headers.get('location', ''))
+
+async def virtual_user(host, port, recorder: Recorder, users: int, deadline: float, think: float, ip: str):
+    # 로그인 후 deadline 까지: 페이지 30%, 생산 현황 polling (ETag) 60%, 재로그인 10%
+    client = HttpClient(host, port)
+    etag = None
+    try:
+        await login(client, recorder, users, ip)
+        while time.monotonic() < deadline:
+            roll = random.random()
+            if roll < 0.3:
+                page = random.choice(PAGES)
+                await recorder.timed(f'GET {page}', (200,), client.request('GET', page))
+            elif roll < 0.9:
+                headers = {'If-None-Match': etag} if etag else {}
+                status, response_headers, _ = await recorder.timed(
+                    'GET /api/production_status', (200, 304),
+                    client.request('GET', '/api/production_status', headers)
+                )
+                etag = response_headers.get('etag', etag)
+            else:
+                await login(client, recorder, users, ip)
+            if think:
+                await asyncio.sleep(random.uniform(0, 2 * think))
+    finally:
+        await client.close()
+
+async def wait_ready(host, port, timeout=30.0, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        client = HttpClient(host, port)
+        try:
+            status, _, _ = await client.request('GET', '/api/manufact')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            await client.close()
+        await asyncio.sleep(interval)
+    raise RuntimeError('서버가 시작되지 않았습니다.')
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def summarize(recorder: Recorder, seconds: float):
+    report = {}
+    for route, values in sorted(recorder.latencies.items()):
+        values.sort()
+        report[route] = {
+            'count': len(values),
+            'rps': round(len(values) / seconds, 1),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+            'errors': recorder.errors.get(route, 0),
+        }
+    return report
+
+def print_report(report, seconds):
+    print(f'{"route":<32}{"count":>8}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for route, r in report.items():
+        print(f'{route:<32}{r["count"]:>8}{r["rps"]:>10}{r["p50_ms"]:>10}{r["p99_ms"]:>10}{r["errors"]:>8}')
+    total = sum(r['count'] for r in report.values())
+    print(f'{"total":<32}{total:>8}{round(total / seconds, 1):>10}')
+
+async def run(host, port, args):
+    recorder = Recorder()
+    await wait_ready(host, port)
+    start = time.monotonic()
+    deadline = start + args.duration
+    await asyncio.gather(*[
+        virtual_user(host, port, recorder, args.users, deadline, args.think, client_ip(i % (args.client_ips or args.clients)))
+        for i in range(args.clients)
+    ])
+    return recorder, time.monotonic() - start
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--users', type=int, default=1000, help='SQLite 에 넣을 사용자 수 (0 이면 admin 으로 로그인)')
+    p.add_argument('--clients', type=int, default=50, help='동시 가상 사용자 수')
+    p.add_argument('--duration', type=float, default=10.0, help='측정 시간 (초)')
+    p.add_argument('--think', type=float, default=0.0, help='요청 사이 평균 대기 시간 (초)')
+    p.add_argument('--client-ips', type=int, default=0, help='가상 사용자가 나눠 쓰는 client IP 수 (0 이면 사용자마다 하나, 1 이면 전부 NAT 하나 뒤)')
+    p.add_argument('--workers', type=int, default=1, help='uvicorn worker 수')
+    p.add_argument('--state-backend', default='memory', choices=('memory', 'shared', 'mysql'), help='STATE_BACKEND (shared = worker 간 unix socket 브로커, mysql = DB 테이블 사용)')
+    p.add_argument('--url', help='이미 떠 있는 서버에 부하 (DB / 서버를 만들지 않음)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--json', help='결과를 JSON 으로 저장')
+    args = p.parse_args()
+    random.seed(args.seed)
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            db_path = Path(tmp) / 'loadtest.db'
+            build_db(db_path, args.users)
+            host, port = '127.0.0.1', free_port()
+            server = start_server(db_path, port, args.workers, args.state_backend)
+        try:
+            recorder, seconds = asyncio.run(run(host, port, args))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = summarize(recorder, seconds)
+    print(f'[*] {args.clients} clients, {args.users} users, {seconds:.1f}s, {args.workers} worker(s), state={args.state_backend}')
+    print_report(report, seconds)
+    if args.json:
+        Path(args.json).write_text(json.dumps({'args': vars(args), 'seconds': seconds, 'routes': report}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,48 @@ USE mydb;
 CREATE TABLE IF NOT EXISTS user(
     id int PRIMARY KEY AUTO_INCREMENT,
     userid VARCHAR(255) NOT NULL UNIQUE,
-    password VARCHAR(255) NOT NULL
+    password VARCHAR(255) NOT NULL,
+    token CHAR(64) NULL UNIQUE
 );
 
-INSERT INTO user VALUES(1, 'admin', '2e6815488d37ba897ad02f4995e963fbd2ab5cc64a18c4cd040b28259ecfa4f0');
\ No newline at end of file
+INSERT INTO user VALUES(1, 'admin', '2e6815488d37ba897ad02f4995e963fbd2ab5cc64a18c4cd040b28259ecfa4f0', '175331106f28687cbd9a3daec1561088a22aa0ed981b10634cc153f1e723fc18');
+
+CREATE TABLE IF NOT EXISTS production_line(
+    material VARCHAR(32) NOT NULL,
+    coordinate VARCHAR(16) NOT NULL,
+    enabled BOOLEAN NOT NULL,
+    PRIMARY KEY (material, coordinate)
+);
+
+CREATE TABLE IF NOT EXISTS production_target(
+    material VARCHAR(32) NOT NULL PRIMARY KEY,
+    target_amount INT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS production_state(
+    id INT NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+INSERT INTO production_line VALUES
+    ('paper', '1-1', TRUE), ('paper', '1-2', TRUE), ('paper', '3-1', TRUE), ('paper', '4-2', FALSE),
+    ('leather', '2-1', TRUE), ('leather', '3-2', FALSE), ('leather', '4-1', TRUE),
+    ('pencil', '2-2', TRUE), ('pencil', '5-1', TRUE), ('pencil', '5-2', FALSE);
+INSERT INTO production_target VALUES ('paper', 1000), ('leather', 500), ('pencil', 200);
+INSERT INTO production_state VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS production_event(
+    recorded_at DOUBLE NOT NULL,
+    material VARCHAR(32) NOT NULL,
+    produced INT NOT NULL,
+    errors INT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS production_rollup(
+    resolution INT NOT NULL,
+    bucket BIGINT NOT NULL,
+    material VARCHAR(32) NOT NULL,
+    produced BIGINT NOT NULL,
+    errors BIGINT NOT NULL,
+    PRIMARY KEY (resolution, bucket, material)
+);
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# smart_factory 기동 시간 측정
+#
+#   import : 새 프로세스에서 `import main` 에 걸리는 시간 (uvicorn worker 가 앱을 올리는 비용)
+#   cold   : uvicorn 프로세스 시작부터 첫 API 응답 / 첫 페이지 응답까지 (SQLite 대체 DB, loadtest.py 와 같은 구성)
+#   top    : -X importtime 기준으로 import 가 오래 걸리는 패키지
+#
+# 사용법:
+#     python startup_bench.py [--runs 5] [--python /path/to/venv/bin/python] [--top 10]
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from loadtest import APP_DIR, HttpClient, build_db, free_port, start_server, wait_ready
+
+IMPORT_SNIPPET = 'import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)'
+BENCH_ENV = {'DB_HOST': 'sqlite', 'DB_PORT': '0', 'DB_USER': 'bench', 'DB_PASSWORD': 'bench', 'DB_NAME': 'bench'}
+
+def bench_env():
+    env = dict(os.environ)
+    for key, value in BENCH_ENV.items():
+        env.setdefault(key, value)
+    return env
+
+def import_time(python):
+    out = subprocess.run([python, '-c', IMPORT_SNIPPET], cwd=APP_DIR, env=bench_env(), capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def import_top(python, top):
+    # -X importtime 출력: "import time: self [us] | cumulative | imported package", 들여쓰기 2칸 = 한 단계.
+    # main 이 직접 import 하는 모듈(한 단계 아래)만 모은다
+    out = subprocess.run([python, '-X', 'importtime', '-c', 'import main'], cwd=APP_DIR, env=bench_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            name = parts[2][1:]
+            if name.startswith('  ') and not name.startswith('    '):
+                rows.append((int(parts[1]), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+async def first_responses(port):
+    await wait_ready('127.0.0.1', port, timeout=60, interval=0.01)
+    api = time.perf_counter()
+    client = HttpClient('127.0.0.1', port)
+    try:
+        await client.request('GET', '/')
+    finally:
+        await client.close()
+    return api, time.perf_counter()
+
+def cold_start(python, db_path):
+    port = free_port()
+    start = time.perf_counter()
+    server = start_server(db_path, port, 1, 'memory', python=python)
+    try:
+        api, page = asyncio.run(first_responses(port))
+    finally:
+        server.terminate()
+        server.wait()
+    return api - start, page - start
+
+def summary(values):
+    return f'min {min(values) * 1000:8.1f} ms   median {statistics.median(values) * 1000:8.1f} ms'
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--runs', type=int, default=5, help='측정 반복 횟수')
+    p.add_argument('--python', default=sys.executable, help='앱을 실행할 인터프리터 (다른 venv 와 비교할 때)')
+    p.add_argument('--top', type=int, default=10, help='import 가 오래 걸리는 패키지 몇 개를 보여줄지')
+    args = p.parse_args()
+
+    imports = [import_time(args.python) for _ in range(args.runs)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'bench.db'
+        build_db(db_path, 10)
+        colds = [cold_start(args.python, db_path) for _ in range(args.runs)]
+
+    print(f'[*] {args.python}, {args.runs} run(s)')
+    print(f'import main          {summary(imports)}')
+    print(f'first API response   {summary([c[0] for c in colds])}')
+    print(f'first page response  {summary([c[1] for c in colds])}')
+    if args.top:
+        print('\nslowest imports of main (cumulative):')
+        for us, name in import_top(args.python, args.top):
+            print(f'  {us / 1000:8.1f} ms  {name}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / 'app'
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(APP_DIR))
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    # init.sql 스키마로 만든 SQLite DB 위에서 설정을 바꿔 가며 앱을 띄운다 (loadtest.py 와 같은 구성)
+    from fastapi.testclient import TestClient
+    from core.config import Settings
+    from loadtest import build_db
+    import main
+
+    db_path = tmp_path / 'test.db'
+    build_db(db_path, 1)
+    monkeypatch.setenv('DB_URL', f'sqlite+aiosqlite:///{db_path}')
+    monkeypatch.chdir(APP_DIR)
+
+    clients = []
+    def make(**overrides):
+        settings = Settings(DB_HOST='test', DB_PORT=0, DB_USER='test', DB_PASSWORD='test', DB_NAME='test', **overrides)
+        test_client = TestClient(main.create_app(settings))
+        clients.append(test_client.__enter__())
+        return test_client
+
+    yield make
+    for test_client in reversed(clients):
+        test_client.__exit__(None, None, None)
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+@pytest.mark.parametrize('item', [
+    {"material": ["paper"], "coordinate": "1-1", "enabled": True},
+    {"material": {"paper": 1}, "coordinate": "1-1", "enabled": True},
+    {"material": "paper", "coordinate": ["1-1"], "enabled": True},
+    {"material": "paper", "coordinate": {"1-1": 1}, "enabled": True},
+])
+def test_batch_rejects_non_string_line_keys(client, item):
+    r = client.post('/api/production_batch', json={"lines": [item]})
+    assert r.status_code == 400
+    assert r.json()["lines"] == [{"status": "error", "message": "Line not found or invalid data."}]
+
+@pytest.mark.parametrize('item, message', [
+    ({"material": ["paper"], "target_amount": 1}, "Material '['paper']' not found."),
+    ({"material": {"paper": 1}, "target_amount": 1}, "Material '{'paper': 1}' not found."),
+    ({"material": "paper", "target_amount": True}, "Invalid target amount."),
+])
+def test_batch_rejects_invalid_target_types(client, item, message):
+    r = client.post('/api/production_batch', json={"targets": [item]})
+    assert r.status_code == 400
+    assert r.json()["targets"] == [{"status": "error", "message": message}]
+
+@pytest.mark.parametrize('amount', ['Infinity', '-Infinity', 'NaN'])
+def test_batch_rejects_non_finite_target(client, amount):
+    body = '{"targets": [{"material": "paper", "target_amount": %s}]}' % amount
+    r = client.post('/api/production_batch', content=body, headers={'Content-Type': 'application/json'})
+    assert r.status_code == 400
+    assert r.json()["targets"] == [{"status": "error", "message": "Invalid target amount."}]
+    assert client.get('/api/production_status').json()["material_targets"]["paper"] == 1000
+
+def test_batch_applies_valid_items(client):
+    r = client.post('/api/production_batch', json={
+        "lines": [{"material": "paper", "coordinate": "4-2", "enabled": True}],
+        "targets": [{"material": "paper", "target_amount": 10}]
+    })
+    assert r.status_code == 200
+    state = client.get('/api/production_status').json()
+    assert state["manufact_lines"]["paper"]["4-2"] is True
+    assert state["material_targets"]["paper"] == 10
+
+@pytest.mark.parametrize('material', [["paper"], {"paper": 1}, None])
+def test_events_reject_non_string_material(client, material):
+    r = client.post('/api/production_events', json={"events": [{"material": material, "produced": 1}]})
+    assert r.status_code == 400
+    assert r.json()["events"] == [{"status": "error", "message": f"Material '{material}' not found."}]
+    assert client.get('/api/production_events').json()["events"] == []
+
+@pytest.mark.parametrize('amount', [2**31, 10**30, 1e300])
+def test_targets_are_bounded_to_int_column(client, amount):
+    r = client.post('/api/production_batch', json={"targets": [{"material": "paper", "target_amount": amount}]})
+    assert r.status_code == 400
+    assert r.json()["targets"] == [{"status": "error", "message": "Invalid target amount."}]
+    client.post('/api/set_target', json={"material": "paper", "target_amount": amount})
+    assert client.get('/api/production_status').json()["material_targets"]["paper"] == 1000
+    r = client.post('/api/production_batch', json={"targets": [{"material": "paper", "target_amount": 2**31 - 1}]})
+    assert r.status_code == 200
+
+@pytest.mark.parametrize('value', ['true', '"1700000000"', 'NaN', 'Infinity'])
+def test_events_reject_invalid_time(client, value):
+    body = '{"events": [{"material": "paper", "produced": 1, "time": %s}]}' % value
+    r = client.post('/api/production_events', content=body, headers={'Content-Type': 'application/json'})
+    assert r.status_code == 400
+    assert r.json()["events"] == [{"status": "error", "message": "Invalid time."}]
+
+def test_events_with_null_time_are_recorded_now(client):
+    before = time.time()
+    r = client.post('/api/production_events', json={"events": [{"material": "paper", "produced": 1, "time": None}]})
+    assert r.status_code == 200
+    [event] = client.get('/api/production_events').json()["events"]
+    assert before <= event["time"] <= time.time()
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+from conftest import APP_DIR
+
+def test_import_main_reads_no_settings():
+    env = {k: v for k, v in os.environ.items() if not k.startswith('DB_')}
+    subprocess.run([sys.executable, '-c', 'import main'], cwd=APP_DIR, env=env, check=True)
+
+def test_apps_use_their_own_settings(make_client):
+    small = make_client(CALC_MAX_BATCH=1)
+    large = make_client(CALC_MAX_BATCH=2)
+    body = {"expressions": ["1+1", "2*3"]}
+    assert small.post('/api/calculate', json=body).status_code == 400
+    assert large.post('/api/calculate', json=body).json() == {"results": [{"result": "2"}, {"result": "6"}]}
+
+def test_apps_do_not_share_state(make_client):
+    a, b = make_client(), make_client()
+    a.post('/api/set_target', json={"material": "paper", "target_amount": 7})
+    assert a.get('/api/production_status').json()["material_targets"]["paper"] == 7
+    assert b.get('/api/production_status').json()["material_targets"]["paper"] == 1000
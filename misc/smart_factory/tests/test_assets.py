@@ -0,0 +1,43 @@
+import pytest
+
+from conftest import APP_DIR
+from core import assets
+
+ENCODINGS = ('gzip', 'identity') + (('br',) if assets.brotli is not None else ())
+
+@pytest.mark.parametrize('path', ['/static/css/product.css', '/'])
+def test_etag_differs_per_encoding(client, path):
+    etags = {}
+    for accept in ENCODINGS:
+        r = client.get(path, headers={'Accept-Encoding': accept})
+        assert r.status_code == 200
+        assert r.headers['Vary'] == 'Accept-Encoding'
+        assert r.headers.get('Content-Encoding', 'identity') == accept
+        etags[accept] = r.headers['ETag']
+    assert len(set(etags.values())) == len(ENCODINGS)
+    assert not any(etag.startswith('W/') for etag in etags.values())
+
+    # 같은 인코딩의 ETag 만 304
+    assert client.get(path, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etags['gzip']}).status_code == 304
+    assert client.get(path, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etags['identity']}).status_code == 200
+
+def test_prebuilt_output_is_served_without_compressing(tmp_path, monkeypatch):
+    # python -m core.assets 가 만든 결과를 build(prebuilt=...) 가 다시 압축하지 않고 그대로 쓴다
+    monkeypatch.chdir(APP_DIR)
+    built = assets.AssetFiles('static')
+    built.write(tmp_path)
+
+    def no_compress(*args, **kwargs):
+        raise AssertionError('compressed at startup')
+    monkeypatch.setattr(assets.gzip, 'compress', no_compress)
+    loaded = assets.AssetFiles('static')
+    loaded.build(prebuilt=tmp_path)
+    assert loaded.manifest == built.manifest
+    for path, (entry, cache_control) in built._files.items():
+        other, other_cache_control = loaded._files[path]
+        assert other_cache_control == cache_control
+        assert (other.body, other.gzip, other.br, other.etag) == (entry.body, entry.gzip, entry.br, entry.etag)
+
+def test_assets_are_built_before_the_first_request(client):
+    import main
+    assert main.assets.built
@@ -0,0 +1,15 @@
+from core import credentials
+from core.config import Settings
+
+def test_ip_limit_takes_a_shift_change_burst(monkeypatch):
+    # NAT 하나 뒤의 한 교대 인원이 한꺼번에 로그인해도 통과, 그 다음부터는 AUTH_IP_RATE 로 채워진다
+    settings = Settings(DB_HOST='test', DB_PORT=0, DB_USER='test', DB_PASSWORD='test', DB_NAME='test')
+    now = [100.0]
+    monkeypatch.setattr(credentials.time, 'monotonic', lambda: now[0])
+    limit = credentials.CredentialService(settings).ip_limit
+
+    assert all(limit.consume('10.0.0.1') for _ in range(1000))
+    assert not limit.consume('10.0.0.1')
+    assert limit.consume('10.0.0.2')
+    now[0] += 1
+    assert sum(limit.consume('10.0.0.1') for _ in range(100)) == settings.AUTH_IP_RATE
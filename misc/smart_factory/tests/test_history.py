@@ -0,0 +1,96 @@
+import asyncio
+import contextlib
+import time
+
+from api.history import MySQLHistory
+from core.config import Settings
+from db import session
+from loadtest import build_db
+
+DAY = 86400
+
+class SlowEngine:
+    # 조회가 DB를 읽은 뒤 커넥션을 돌려주기까지 delay 만큼 틈을 벌린다 (그 사이에 flush 가 끼어들 수 있게)
+    def __init__(self, engine, delay):
+        self.engine = engine
+        self.delay = delay
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    @contextlib.asynccontextmanager
+    async def connect(self):
+        async with self.engine.connect() as conn:
+            yield conn
+        await asyncio.sleep(self.delay)
+
+def run_history(tmp_path, monkeypatch, scenario, delay):
+    # SQLite 위의 MySQLHistory 로 scenario(history) 를 돌린다
+    db_path = tmp_path / 'history.db'
+    build_db(db_path, 0)
+    monkeypatch.setenv('DB_URL', f'sqlite+aiosqlite:///{db_path}')
+    settings = Settings(DB_HOST='test', DB_PORT=0, DB_USER='test', DB_PASSWORD='test', DB_NAME='test')
+
+    async def main():
+        session.init_engine(settings)
+        engine = session.db_engine
+        history = MySQLHistory(60, raw_size=1000, retention={'minute': DAY, 'hour': DAY, 'day': DAY})
+        await history.start()
+        session.db_engine = SlowEngine(engine, delay)
+        try:
+            return await scenario(history)
+        finally:
+            session.db_engine = engine
+            await history.close()
+            await session.dispose_engine()
+
+    return asyncio.run(main())
+
+def test_mysql_history_query_during_flush(tmp_path, monkeypatch):
+    # 기록 / flush / 조회를 섞어 돌려도 조회 합계는 조회 시작~끝 사이에 기록된 수 범위 안 (두 번 세거나 빠지지 않음)
+    now = time.time()
+
+    async def scenario(history):
+        recorded = 0
+        results = []
+
+        async def writer():
+            nonlocal recorded
+            for _ in range(300):
+                history.record([(now, 'paper', 1, 0)])
+                recorded += 1
+                await asyncio.sleep(0)
+
+        async def flusher():
+            for _ in range(60):
+                await history._flush()
+                await asyncio.sleep(0)
+
+        async def reader():
+            for _ in range(60):
+                before = recorded
+                buckets = await history.query('day', now - DAY, now + 1)
+                results.append((before, sum(b[1] for b in buckets), recorded))
+
+        await asyncio.gather(writer(), flusher(), reader())
+        await history._flush()
+        final = await history.query('day', now - DAY, now + 1)
+        return results, sum(b[1] for b in final), recorded
+
+    results, final, recorded = run_history(tmp_path, monkeypatch, scenario, 0.002)
+    assert final == recorded == 300
+    assert all(before <= got <= after for before, got, after in results), results
+
+def test_mysql_history_queries_do_not_wait_for_each_other(tmp_path, monkeypatch):
+    # DB 왕복 동안 lock 을 잡지 않으므로 동시에 들어온 조회 10개가 한 번의 왕복 시간 안팎에 끝난다
+    now = time.time()
+
+    async def scenario(history):
+        history.record([(now, 'paper', 1, 0)])
+        started = time.perf_counter()
+        results = await asyncio.gather(*[history.query('day', now - DAY, now + 1) for _ in range(10)])
+        return results, time.perf_counter() - started
+
+    results, elapsed = run_history(tmp_path, monkeypatch, scenario, 0.1)
+    assert all(sum(b[1] for b in buckets) == 1 for buckets in results)
+    assert elapsed < 0.5
@@ -0,0 +1,13 @@
+import pytest
+
+from core import metrics
+
+def test_unhandled_exception_counts_as_500(client):
+    def boom():
+        raise RuntimeError('boom')
+
+    client.app.add_api_route('/boom', boom)
+    with pytest.raises(RuntimeError):
+        client.get('/boom')
+    assert metrics.REQUESTS._values[('GET', '/boom', 500)] == 1
+    assert 'http_request_duration_seconds_count{method="GET",route="/boom"} 1' in client.get('/metrics').text
@@ -0,0 +1,103 @@
+import asyncio
+import contextlib
+import time
+
+from api.state import MySQLStateStore
+from core.config import Settings
+from db import session
+from loadtest import build_db
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_mysql_store_pushes_other_worker_changes_without_requests(make_client):
+    # 같은 DB를 쓰는 worker 두 개. b 에는 요청을 보내지 않아도 a 의 변경이 on_reload (SSE) 로 나가야 한다
+    a = make_client(STATE_BACKEND='mysql', STATE_FLUSH_INTERVAL=0.01, STATE_POLL_INTERVAL=0.02)
+    b = make_client(STATE_BACKEND='mysql', STATE_FLUSH_INTERVAL=0.01, STATE_POLL_INTERVAL=0.02)
+    reloads = []
+    b.app.state.state_store.on_reload = reloads.append
+
+    r = a.post('/api/set_target', json={"material": "paper", "target_amount": 42})
+    assert r.json()["status"] == "success"
+    wait_for(lambda: reloads)
+    assert reloads[-1]["material_targets"]["paper"] == 42
+    assert b.get('/api/production_status').json()["material_targets"]["paper"] == 42
+
+def test_mysql_store_refresh_during_flush_keeps_write(tmp_path, monkeypatch):
+    # flush 가 대기열을 분리한 뒤 commit 하기 전에 다시 읽기가 끼어들어도 방금 쓴 값이 snapshot에서 사라지면 안 된다
+    db_path = tmp_path / 'state.db'
+    build_db(db_path, 0)
+    monkeypatch.setenv('DB_URL', f'sqlite+aiosqlite:///{db_path}')
+    settings = Settings(DB_HOST='test', DB_PORT=0, DB_USER='test', DB_PASSWORD='test', DB_NAME='test')
+
+    async def scenario():
+        session.init_engine(settings)
+        engine = session.db_engine
+        a, b = MySQLStateStore(3600, 3600), MySQLStateStore(3600, 3600)
+        await a.start()
+        await b.start()
+        # 다른 worker 가 먼저 써서 a 가 다시 읽어야 하는 상태
+        await b.apply(targets={'leather': 7})
+        await b._flush()
+
+        class SlowEngine:
+            # 트랜잭션 시작을 늦춰서 a 의 flush 가 대기열을 분리한 채로 기다리게 한다
+            def __getattr__(self, name):
+                return getattr(engine, name)
+
+            @contextlib.asynccontextmanager
+            async def begin(self):
+                await asyncio.sleep(0.05)
+                async with engine.begin() as conn:
+                    yield conn
+
+        try:
+            await a.apply(targets={'paper': 42})
+            session.db_engine = SlowEngine()
+            await asyncio.gather(a._flush(), a._refresh())
+            session.db_engine = engine
+            await a._refresh()
+            _, state = await a.snapshot()
+        finally:
+            session.db_engine = engine
+            await a.close()
+            await b.close()
+            await session.dispose_engine()
+        return state
+
+    state = asyncio.run(scenario())
+    assert state["material_targets"]["paper"] == 42
+    assert state["material_targets"]["leather"] == 7
+
+def test_mysql_store_drops_write_that_cannot_be_stored(tmp_path, monkeypatch):
+    # DB에 들어갈 수 없는 값 하나 때문에 같이 모인 쓰기와 그 뒤의 쓰기가 계속 밀리면 안 된다
+    db_path = tmp_path / 'state.db'
+    build_db(db_path, 0)
+    monkeypatch.setenv('DB_URL', f'sqlite+aiosqlite:///{db_path}')
+    settings = Settings(DB_HOST='test', DB_PORT=0, DB_USER='test', DB_PASSWORD='test', DB_NAME='test')
+
+    async def scenario():
+        session.init_engine(settings)
+        store, other = MySQLStateStore(3600, 3600), MySQLStateStore(3600, 3600)
+        try:
+            await store.start()
+            await store.apply(lines={('paper', '4-2'): True}, targets={'paper': 10**30, 'leather': 7})
+            await store._flush()
+            await store.apply(targets={'pencil': 9})
+            await store._flush()
+            await store._refresh()
+            await other.start()
+            return store._has_pending(), (await store.snapshot())[1], (await other.snapshot())[1]
+        finally:
+            await store.close()
+            await other.close()
+            await session.dispose_engine()
+
+    pending, state, stored = asyncio.run(scenario())
+    assert not pending
+    for s in (state, stored):
+        assert s["material_targets"] == {"paper": 1000, "leather": 7, "pencil": 9}
+        assert s["manufact_lines"]["paper"]["4-2"] is True